@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/18 21:05
+# Author  : Yichen Lu
+
+import sys
+import copy
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+
+import utils
+import minesweeper
+from minesweeper import interact
+from solver import Engine
+from solver.stats import Stats
+from solver.patterns import PatternDatabase
+from global_variables import *
+
+# name -> (height, width, mines)
+LEVELS = {
+    "beginner": (9, 9, 10),
+    "intermediate": (16, 16, 40),
+    "expert": (16, 30, 99),
+}
+CATEGORIES = ["opening", "midgame", "hard"]
+# (height, width, mines) of boards in scaling benchmark, about the density of expert
+SCALES = [(9, 9, 10), (16, 30, 99), (50, 50, 500), (100, 100, 2000), (200, 200, 8000), (500, 500, 50000)]
+# boards in scaling benchmark of chunked boards (see minesweeper/chunked.py)
+CHUNKED_SCALES = [(1000, 1000, 206250), (10000, 10000, 20625000)]
+
+
+def play_positions(seed, height, width, mines):
+    """
+    play a game with the global random state seeded
+    :return: list of (context, event of Engine.stats) before each move
+    """
+    random.seed(seed)
+    context = minesweeper.initialize(Engine.first_step(), height, width, mines)
+    context.is_draw = False
+    events = []
+    engine = Engine(context, stats=Stats(hook=events.append))
+
+    positions = []
+    while not context.is_over and not context.is_win:
+        snapshot = copy.deepcopy(context)
+        ops = engine.what_next(mode="most")
+        positions.append((snapshot, events[-1]))
+        ops = [ops] if isinstance(ops, interact.Operation) else sorted(ops, key=lambda op: (op.h, op.w, op.op))
+        context.interact_batch(ops)
+    return positions
+
+
+def build_corpus(seed=0, games=5):
+    """
+    Seeded corpus of positions, identical for the same seed and games:
+        opening: positions after the first step of each level
+        midgame: positions with the most frontier unseens in expert games
+        hard: positions reaching level 3 inference with the largest groups in expert games
+    :return: list of {"name": ..., "category": ..., "context": ...}
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for level, (height, width, mines) in LEVELS.items():
+        for i in range(games):
+            random.seed(rng.getrandbits(64))
+            context = minesweeper.initialize(Engine.first_step(), height, width, mines)
+            context.is_draw = False
+            corpus.append({"name": f"{level}-{i}", "category": "opening", "context": context})
+
+    height, width, mines = LEVELS["expert"]
+    hard_positions = []
+    for i in range(games):
+        positions = play_positions(rng.getrandbits(64), height, width, mines)
+        context, _ = max(positions, key=lambda position: len(position[0].front_side.frontier_unseens))
+        corpus.append({"name": f"expert-{i}", "category": "midgame", "context": context})
+        for j, (context, event) in enumerate(positions):
+            if "level 3" in event["stages"]:
+                hard_positions.append((max(event["group_sizes"], default=0), f"expert-{i}-{j}", context))
+    hard_positions.sort(key=lambda position: (-position[0], position[1]))
+    for _, name, context in hard_positions[:games]:
+        corpus.append({"name": name, "category": "hard", "context": context})
+    return corpus
+
+
+def safe_zero(context):
+    """
+    :return: an unseen position whose back side is 0, None if not found
+    """
+    front_codes, back_codes = context.front_side.codes, context.back_side.codes
+    for index in range(len(front_codes)):
+        if front_codes[index] == UNSEEN_CODE and back_codes[index] == 0:
+            return divmod(index, context.front_side.width)
+    return None
+
+
+def iter_hints(engine):
+    return list(utils.iter_incomplete_hints(engine.context))
+
+
+# Each benchmark prepares a call on a copy of context out of timing, and returns None if it does not apply. A call
+# changing its context is returned with a function preparing its argument before each call, i.e., (prepare, call).
+def bench_what_next(patterns):
+    """
+    :param patterns: "off" for engines without pattern database, "fresh" for an empty database of each call, thus
+           timings never depend on patterns learned by earlier calls (e.g., the database shared in process)
+    """
+    def bench(context):
+        # a fresh engine for each call, thus no counter is cached
+        return (lambda: Engine(context, patterns=PatternDatabase() if patterns == "fresh" else False),
+                lambda engine: engine.what_next(mode="most"))
+    return bench
+
+
+def bench_inference(level):
+    def bench(context):
+        engine = Engine(context, cache_size=0)
+        if level >= 3:
+            return lambda: engine.inference(level=level)
+        hints = iter_hints(engine)
+        return lambda: [engine.inference(level=level, h=h, w=w) for h, w in hints]
+    return bench
+
+
+def bench_deep_inference(context):
+    engine = Engine(context, cache_size=0)
+    groups = engine.group_incomplete_hints_into_disjoint_sets()
+    return lambda: engine.deep_inference(groups)
+
+
+def bench_guess(version):
+    def bench(context):
+        engine = Engine(context)
+        probs = engine.inference(level=3)["probs"]
+        if not probs:
+            return None
+        guess = getattr(engine, f"let_me_guess_v{version}")
+        return lambda: guess(probs)
+    return bench
+
+
+def bench_look_around(context):
+    positions = list(context.front_side.hints) + list(context.front_side.unseens)
+    return lambda: [utils.look_around(h, w, context) for h, w in positions]
+
+
+def bench_iter_arounds(context):
+    positions = list(context.front_side.frontier_unseens) or list(context.front_side.unseens)
+    return lambda: list(utils.iter_arounds(positions, context.height, context.width, around_type="HINT",
+                                           context=context))
+
+
+def bench_step_bfs(context):
+    position = safe_zero(context)
+    if position is None:
+        return None
+    # each call floods a fresh copy prepared out of timing
+    return lambda: copy.deepcopy(context), lambda fresh: fresh.step_bfs(*position)
+
+
+BENCHMARKS = {
+    "what_next": bench_what_next("off"),
+    "what_next/patterns": bench_what_next("fresh"),
+    "inference/level 1": bench_inference(1),
+    "inference/level 2": bench_inference(2),
+    "inference/level 4": bench_inference(4),
+    "inference/level 3": bench_inference(3),
+    "deep_inference": bench_deep_inference,
+    "guess/v1": bench_guess(1),
+    "guess/v2": bench_guess(2),
+    "guess/v3": bench_guess(3),
+    "micro/look_around": bench_look_around,
+    "micro/iter_arounds": bench_iter_arounds,
+    "micro/step_bfs": bench_step_bfs,
+}
+
+
+def measure(func, repeat):
+    """
+    :param func: call or (prepare, call)
+    :return: seconds of each call after a warm up call
+    """
+    prepare, func = func if isinstance(func, tuple) else (None, func)
+    times = []
+    for i in range(repeat + 1):
+        args = (prepare(), ) if prepare else ()
+        start = time.perf_counter()
+        func(*args)
+        if i > 0:
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def run(corpus, repeat=5, names=None, verbose=True):
+    """
+    :return: benchmark -> category -> {"positions": ..., "calls": ..., "mean": ..., "median": ..., "min": ...,
+             "max": ...} in seconds per call
+    """
+    results = dict()
+    for name, bench in BENCHMARKS.items():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        results[name] = dict()
+        for category in CATEGORIES:
+            times, n_positions = [], 0
+            for position in corpus:
+                if position["category"] != category:
+                    continue
+                func = bench(copy.deepcopy(position["context"]))
+                if func is None:
+                    continue
+                n_positions += 1
+                times.extend(measure(func, repeat))
+            if not times:
+                continue
+            results[name][category] = {
+                "positions": n_positions,
+                "calls": len(times),
+                "mean": statistics.fmean(times),
+                "median": statistics.median(times),
+                "min": min(times),
+                "max": max(times),
+            }
+            if verbose:
+                print(f"{name:>20} {category:>8}: median {results[name][category]['median'] * 1e3:9.3f}ms, "
+                      f"mean {results[name][category]['mean'] * 1e3:9.3f}ms ({n_positions} positions)")
+    return results
+
+
+def scaling(seed=0, moves=20, scales=SCALES, verbose=True, chunk_size=None):
+    """
+    play the first moves of a seeded board of each size in the same process
+    :param chunk_size: side of chunks of chunked boards, plain boards if None
+    :return: "height x width x mines" -> {"initialize": ..., "moves": ..., "what_next": ..., "interact": ...} in
+             seconds, mean seconds per move for what_next and interact
+    """
+    results = dict()
+    for height, width, mines in scales:
+        random.seed(seed)
+        start = time.perf_counter()
+        context = minesweeper.initialize(Engine.first_step(), height, width, mines, seed=seed, chunk_size=chunk_size)
+        initialize_time = time.perf_counter() - start
+        context.is_draw = False
+        engine = Engine(context)
+
+        what_next_times, interact_times = [], []
+        while len(what_next_times) < moves and not context.is_over and not context.is_win:
+            start = time.perf_counter()
+            ops = engine.what_next(mode="most")
+            what_next_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            context.interact_batch(ops)
+            interact_times.append(time.perf_counter() - start)
+
+        name = f"{height}x{width}x{mines}"
+        results[name] = {
+            "initialize": initialize_time,
+            "moves": len(what_next_times),
+            "what_next": statistics.fmean(what_next_times),
+            "interact": statistics.fmean(interact_times),
+        }
+        if verbose:
+            print(f"{name:>16}: initialize {initialize_time * 1e3:9.3f}ms, "
+                  f"what_next {results[name]['what_next'] * 1e3:9.3f}ms, "
+                  f"interact {results[name]['interact'] * 1e3:9.3f}ms ({len(what_next_times)} moves)")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "commit": commit,
+        "board_backend": BOARD_BACKEND,
+        "level3_search": LEVEL3_SEARCH,
+        "pattern_db": PATTERN_DB,
+        # pattern database of what_next benchmarks, see bench_what_next()
+        "what_next_patterns": {"what_next": "off", "what_next/patterns": "fresh"},
+    }
+
+
+def compare(results, baseline):
+    """
+    print ratios of medians to those of baseline, > 1 for slower
+    """
+    for name, categories in results.items():
+        for category, result in categories.items():
+            base = baseline.get(name, {}).get(category)
+            if base is None or base["median"] == 0:
+                continue
+            ratio = result["median"] / base["median"]
+            print(f"{name:>20} {category:>8}: {base['median'] * 1e3:9.3f}ms -> {result['median'] * 1e3:9.3f}ms, "
+                  f"x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark solver on a seeded corpus of positions.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--games", type=int, default=5, help="positions of each level and category")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls of each position")
+    parser.add_argument("--only", type=str, nargs="*", default=None, help="prefixes of benchmark names")
+    parser.add_argument("--output", type=str, default=None, help="path to save results in json")
+    parser.add_argument("--compare", type=str, default=None, help="path of results in json to compare with")
+    parser.add_argument("--scaling", type=int, default=0, help="moves played on boards of each size in SCALES")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="play chunked boards of CHUNKED_SCALES with such chunk size in scaling benchmark")
+    args = parser.parse_args()
+
+    start = time.time()
+    corpus = build_corpus(args.seed, args.games)
+    print(f"corpus: {len(corpus)} positions in {time.time() - start:.2f}s")
+    results = run(corpus, args.repeat, args.only)
+
+    report = {
+        "environment": environment(),
+        "corpus": {"seed": args.seed, "games": args.games,
+                   "positions": [(position["name"], position["category"]) for position in corpus]},
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.scaling:
+        if args.chunk_size:
+            report["scaling"] = scaling(args.seed, args.scaling, CHUNKED_SCALES, chunk_size=args.chunk_size)
+        else:
+            report["scaling"] = scaling(args.seed, args.scaling)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        print(f"compare with {args.compare} ({baseline['environment']['commit']}):")
+        compare(results, baseline["results"])
+
+
+if __name__ == '__main__':
+    main()
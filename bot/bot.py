@@ -26,7 +26,7 @@ class Bot(object):
         self.mouse = MController()
         self.keyboard = KController()
 
-        self.front_side = FrontSide(HEIGHT, WIDTH)
+        self.front_side = FrontSide(context.height, context.width, context.mines)
         self.front_side.initialize()
 
         self.wait_time_between_ops = 0.05
@@ -40,6 +40,7 @@ class Bot(object):
         while signal == "OK":
             signal = self.interact()
         self.press_escape()
+        self.resolver.save_cache()
 
     def interact(self):
         self.move_mouse_to_corner()
@@ -55,8 +56,9 @@ class Bot(object):
 
     def execute_ops(self, ops):
         ops = ops if isinstance(ops, Iterable) else [ops]
-        for op in ops:
-            time.sleep(self.wait_time_between_ops)
+        for i, op in enumerate(ops):
+            if i > 0:
+                time.sleep(self.wait_time_between_ops)
             if op.op == "step":
                 self.step(op.h, op.w)
             elif op.op == "flag":
@@ -65,6 +67,8 @@ class Bot(object):
                 raise ValueError(f"Invalid op type: {op.op}.")
 
         # Typically, guessing op would appear individually, so is_win_or_over() is called after all ops executed.
+        # Mouse is moved away first, thus the board settled in is_win_or_over() is resolved in the next interact().
+        self.move_mouse_to_corner()
         signal = self.resolver.is_win_or_over()
         if signal in ["WIN", "OVER"]:
             return signal
@@ -11,7 +11,16 @@ MINES = 99
 UNSEEN = "🟦"
 FLAG = "🚩"
 MINE = "💀"
+# Integer codes of cells stored in boards, hint codes are the hint values (0-8) themselves.
+UNSEEN_CODE, FLAG_CODE, MINE_CODE = 9, 10, 11
+# Storage backend of boards, "list" (pure python) or "numpy" (int8 array, requires numpy).
+BOARD_BACKEND = "list"
 TAB_SIZE = 3
+# Neighbor tables (see utils.neighbor_positions()) are built for boards with at most such number of cells, and
+# neighbors are computed on access for larger boards.
+NEIGHBOR_TABLE_MAX_CELLS = 1 << 18
+# Side of square chunks of chunked boards (see minesweeper/chunked.py), which are materialized on first access.
+CHUNK_SIZE = 64
 # In old version, first step is safe for sure, but it may not be "0".
 # And in new version, first step is safe for sure and it must be "0".
 VERSION = "new"
@@ -19,5 +28,32 @@ VERSION = "new"
 # The longest time (10 seconds for default) allowed in dfs function in LEVEL3 inference
 # When time runs out, dfs will be terminated.
 LEVEL3_THRESHOLD = 100
+# Seconds of sampling to estimate a group when dfs in LEVEL3 inference is terminated.
+LEVEL3_SAMPLING_TIME = 1.
+
+# Search mode in LEVEL3 inference, "plain" (hints in order), "fc" (forward checking, most constrained hint first) or
+# "classes" (unseens around the same hints are collapsed into a class and counted by number of mines in the class).
+LEVEL3_SEARCH = "classes"
+
+# Max number of solved groups of incomplete hints cached by Engine among moves in LEVEL3 inference.
+LEVEL3_CACHE_SIZE = 1024
+# Number of worker processes solving groups of incomplete hints in LEVEL3 inference (0 for disabled), and only groups
+# with at least LEVEL3_PARALLEL_MIN_UNSEENS unseens are sent to workers.
+LEVEL3_WORKERS = 0
+LEVEL3_PARALLEL_MIN_UNSEENS = 16
+
+# Inland unseens are given a probability each in LEVEL3 inference only if there are at most such number of them,
+# otherwise they share a single probability, i.e., conclusion["inland_prob"].
+INLAND_PROBS_MAX = 1 << 16
+
+# Pattern database of 5 x 5 windows consulted before LEVEL1 inference, loaded from PATTERN_DB_PATH if it exists.
+PATTERN_DB = True
+PATTERN_DB_PATH = "patterns.bin"
+# Cache of classes of grids keyed by fingerprints of their pixels, consulted before HOG classification in Resolver,
+# loaded from and saved to RESOLVER_CACHE_PATH.
+RESOLVER_CACHE = True
+RESOLVER_CACHE_PATH = "grids.bin"
+# Instrumentation of Engine (see solver/stats.py), disabled for default.
+ENGINE_STATS = False
 
 EXP = 0.1
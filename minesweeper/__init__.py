@@ -5,14 +5,29 @@
 
 from minesweeper.board import *
 from minesweeper.interact import *
+from minesweeper import chunked
 from global_variables import *
 
 
-def initialize(first_step) -> interact.Context:
-    front_side = board.FrontSide(HEIGHT, WIDTH)
+def initialize(first_step, height=HEIGHT, width=WIDTH, mines=MINES, seed=None, back_side=None,
+               chunk_size=None) -> interact.Context:
+    """
+    :param seed: seed of mines, global random state is used if None
+    :param back_side: a prepared back side, e.g., from a board corpus, instead of a new one
+    :param chunk_size: side of chunks for a chunked board materialized on access (see minesweeper/chunked.py), e.g.,
+           CHUNK_SIZE for very large boards, a plain board if None
+    """
+    if chunk_size is None:
+        front_side = board.FrontSide(height, width, mines)
+    else:
+        front_side = chunked.ChunkedFrontSide(height, width, mines, chunk_size)
     front_side.initialize()
-    back_side = board.BackSide(HEIGHT, WIDTH, MINES)
-    back_side.initialize(version=VERSION, first_step=first_step)
+    if back_side is None:
+        if chunk_size is None:
+            back_side = board.BackSide(height, width, mines)
+        else:
+            back_side = chunked.ChunkedBackSide(height, width, mines, chunk_size)
+        back_side.initialize(version=VERSION, first_step=first_step, seed=seed)
     context = interact.Context(front_side, back_side)
     context.interact(first_step)
     return context
@@ -7,25 +7,106 @@ import random
 import utils
 from global_variables import *
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# code -> value returned by Board.get()
+CODE_TO_VALUE = tuple(range(9)) + (UNSEEN, FLAG, MINE)
+# code -> type returned by Board.type()
+CODE_TO_TYPE = ("HINT", ) * 9 + (UNSEEN, FLAG, MINE)
+# code -> symbol in Board.board
+CODE_TO_SYMBOL = tuple(str(i) for i in range(9)) + (UNSEEN, FLAG, MINE)
+SYMBOL_TO_CODE = {UNSEEN: UNSEEN_CODE, FLAG: FLAG_CODE, MINE: MINE_CODE}
+
+
+def encode(value):
+    """
+    encode value of a cell into integer code
+    :param value: hint (int or str), UNSEEN, FLAG or MINE
+    :return: code
+    """
+    code = SYMBOL_TO_CODE.get(value)
+    return code if code is not None else int(value)
+
 
 class Board(object):
-    def __init__(self, height, width):
+    """
+    Cells are stored as integer codes in a flat sequence (h * width + w), which is a list in "list" backend and an
+    int8 array in "numpy" backend.
+    """
+    def __init__(self, height, width, backend=None):
         self.height = height
         self.width = width
-        self.board = [[None for _ in range(self.width)] for _ in range(self.height)]
+        self.backend = backend or BOARD_BACKEND
+        assert self.backend in ["list", "numpy"]
+        if self.backend == "numpy" and np is None:
+            raise ImportError("Board backend \"numpy\" requires numpy.")
+        self.codes = self.new_codes(UNSEEN_CODE)
 
     def initialize(self):
         raise NotImplementedError
 
+    def new_codes(self, code):
+        if self.backend == "numpy":
+            return np.full(self.height * self.width, code, dtype=np.int8)
+        return [code] * (self.height * self.width)
+
+    @property
+    def board(self):
+        """
+        2-D list of symbols (str of hint, UNSEEN, FLAG or MINE)
+        """
+        codes = self.codes.tolist() if self.backend == "numpy" else self.codes
+        return [[CODE_TO_SYMBOL[code] for code in codes[h * self.width: (h + 1) * self.width]]
+                for h in range(self.height)]
+
+    @board.setter
+    def board(self, board):
+        codes = [encode(board[h][w]) for h in range(self.height) for w in range(self.width)]
+        self.codes = np.array(codes, dtype=np.int8) if self.backend == "numpy" else codes
+
     def get(self, h, w):
-        return self.board[h][w] if self.board[h][w] in [UNSEEN, MINE, FLAG] else int(self.board[h][w])
+        return CODE_TO_VALUE[self.codes[h * self.width + w]]
 
     def type(self, h, w):
-        return self.get(h, w) if self.get(h, w) in [UNSEEN, MINE, FLAG] else "HINT"
+        return CODE_TO_TYPE[self.codes[h * self.width + w]]
+
+    def set(self, h, w, value):
+        self.codes[h * self.width + w] = encode(value)
+
+    def grid(self):
+        """
+        :return: codes in shape of (height, width), a view of codes in "numpy" backend
+        """
+        if self.backend == "numpy":
+            return self.codes.reshape(self.height, self.width)
+        return [self.codes[h * self.width: (h + 1) * self.width] for h in range(self.height)]
+
+    def hint_mask(self):
+        if self.backend == "numpy":
+            return self.grid() <= 8
+        return [[code <= 8 for code in row] for row in self.grid()]
+
+    def unseen_mask(self):
+        if self.backend == "numpy":
+            return self.grid() == UNSEEN_CODE
+        return [[code == UNSEEN_CODE for code in row] for row in self.grid()]
+
+    def value_grid(self):
+        """
+        :return: values of hints in shape of (height, width), -1 for cells which are not hint
+        """
+        if self.backend == "numpy":
+            grid = self.grid()
+            return np.where(grid <= 8, grid, -1)
+        return [[code if code <= 8 else -1 for code in row] for row in self.grid()]
 
     def draw_board(self, ch_mapping=lambda x: x) -> str:
-        head = [" " * TAB_SIZE, "|", *[utils.fill_till_width(str(w), TAB_SIZE) for w in range(WIDTH)]]
-        line = ["-" * TAB_SIZE, "|", *["-" * TAB_SIZE for _ in range(WIDTH)]]
+        head = [" " * TAB_SIZE, "|", *[utils.fill_till_width(str(w), TAB_SIZE) for w in range(self.width)]]
+        line = ["-" * TAB_SIZE, "|", *["-" * TAB_SIZE for _ in range(self.width)]]
 
         rows = [head, line]
         for h, row in enumerate(self.board):
@@ -38,36 +119,137 @@ class Board(object):
 
 
 class FrontSide(Board):
-    def __init__(self, height, width):
-        super().__init__(height, width)
+    def __init__(self, height, width, mines, backend=None):
+        super().__init__(height, width, backend)
 
+        self.mines = mines
         self.hints = None
         self.unseens = None
         self.flags = None
 
+        # frontier sets, kept up to date by update_frontier()
+        # incomplete hints: hints with unseens around
+        # frontier unseens: unseens with hints around
+        # inland unseens: unseens without hints around
+        self.incomplete_hints = None
+        self.frontier_unseens = None
+        self.inland_unseens = None
+
+        # codes when update_from_board() was called last time
+        self.synced_codes = None
+
     def initialize(self):
-        self.board = [[UNSEEN for w in range(self.width)] for h in range(self.height)]
+        self.codes = self.new_codes(UNSEEN_CODE)
         self.hints = set()
         self.unseens = set([(h, w) for h in range(self.height) for w in range(self.width)])
         self.flags = set()
 
-    def set(self, h, w, value):
-        self.board[h][w] = str(value)
+        self.incomplete_hints = set()
+        self.frontier_unseens = set()
+        self.inland_unseens = set(self.unseens)
+        self.synced_codes = self.codes.copy()
 
     @property
     def remains(self):
-        return MINES - len(self.flags)
+        return self.mines - len(self.flags)
+
+    def update_frontier(self, positions):
+        """
+        update frontier sets after tiles at positions changed, only these tiles and tiles around them are affected
+        :param positions: positions of changed tiles
+        """
+        positions_around = utils.neighbor_positions(self.height, self.width)
+        affected = set(positions)
+        for h, w in positions:
+            affected.update(positions_around[h * self.width + w])
+
+        indices_around = utils.neighbor_indices(self.height, self.width)
+        codes = self.codes
+        for h, w in affected:
+            index = h * self.width + w
+            code = codes[index]
+            self.incomplete_hints.discard((h, w))
+            self.frontier_unseens.discard((h, w))
+            self.inland_unseens.discard((h, w))
+            if code <= 8:
+                if any(codes[around_index] == UNSEEN_CODE for around_index in indices_around[index]):
+                    self.incomplete_hints.add((h, w))
+            elif code == UNSEEN_CODE:
+                if any(codes[around_index] <= 8 for around_index in indices_around[index]):
+                    self.frontier_unseens.add((h, w))
+                else:
+                    self.inland_unseens.add((h, w))
+
+    def apply_changes(self, changes):
+        """
+        apply change set given by Context.interact_batch() to a front side mirroring the one in context
+        :param changes: interact.ChangeSet
+        """
+        for (h, w), value in changes.revealed.items():
+            self.set(h, w, value)
+            self.unseens.discard((h, w))
+            self.hints.add((h, w))
+        for h, w in changes.flags:
+            self.set(h, w, FLAG)
+            self.unseens.discard((h, w))
+            self.flags.add((h, w))
+        for h, w in changes.unflags:
+            self.set(h, w, UNSEEN)
+            self.flags.discard((h, w))
+            self.unseens.add((h, w))
+        positions = changes.positions
+        self.update_frontier(positions)
+        for h, w in positions:
+            self.synced_codes[h * self.width + w] = self.codes[h * self.width + w]
 
     def update_from_board(self):
         """
         In context, front side is updated by context instance, and in bot environment, back side is unknown. Thus,
         front side information must be updated with its board by itself.
+        Only tiles changed since last call are visited if possible.
+        """
+        if self.synced_codes is None or len(self.synced_codes) != len(self.codes) or self.hints is None:
+            self.rebuild_from_board()
+            return
+
+        if self.backend == "numpy":
+            changed = np.flatnonzero(self.codes != self.synced_codes).tolist()
+        else:
+            changed = [index for index, (code, synced_code) in enumerate(zip(self.codes, self.synced_codes))
+                       if code != synced_code]
+        self.update_cells([divmod(index, self.width) for index in changed])
+
+    def update_cells(self, positions):
+        """
+        update sets and frontier after tiles at positions are changed on board, e.g., by a resolver which knows the
+        changed tiles, thus other tiles are not visited
+        """
+        if any(self.type(h, w) == MINE for h, w in positions):
+            raise RuntimeError
+
+        for h, w in positions:
+            self.hints.discard((h, w))
+            self.unseens.discard((h, w))
+            self.flags.discard((h, w))
+            tile_type = self.type(h, w)
+            if tile_type == "HINT":
+                self.hints.add((h, w))
+            elif tile_type == FLAG:
+                self.flags.add((h, w))
+            else:
+                self.unseens.add((h, w))
+            self.synced_codes[h * self.width + w] = self.codes[h * self.width + w]
+        self.update_frontier(positions)
+
+    def rebuild_from_board(self, allow_mines=False):
+        """
+        :param allow_mines: whether uncovered mines (in game over) are allowed, which are taken as hints as in context
         """
         self.hints, self.unseens, self.flags = set(), set(), set()
 
         for h in range(self.height):
             for w in range(self.width):
-                if self.type(h, w) == "HINT":
+                if self.type(h, w) == "HINT" or (allow_mines and self.type(h, w) == MINE):
                     self.hints.add((h, w))
                 elif self.type(h, w) == FLAG:
                     self.flags.add((h, w))
@@ -76,39 +258,146 @@ class FrontSide(Board):
                 else:
                     raise RuntimeError
 
+        self.incomplete_hints, self.frontier_unseens, self.inland_unseens = set(), set(), set()
+        self.update_frontier([(h, w) for h in range(self.height) for w in range(self.width)])
+        self.synced_codes = self.codes.copy()
+
 
 class BackSide(Board):
-    def __init__(self, height, width, mines):
-        super().__init__(height, width)
+    def __init__(self, height, width, mines, backend=None):
+        super().__init__(height, width, backend)
 
         self.mines = mines
         self.mine_positions = None
 
-    def init_mines(self, mines=None, first_step=None, version="old"):
+        # openings: connected "0" tiles together with the hints on their border, which are uncovered at once by
+        # stepping on any "0" tile of them.
+        # opening_labels[h * width + w] is the opening index of tile (h, w) if it is "0", otherwise -1
+        self.opening_labels = None
+        self.opening_indices = None
+        self.opening_positions = None
+
+    def init_mines(self, mines=None, first_step=None, version="old", rng=None):
+        """
+        :param rng: random.Random for mines, global random state if None
+        """
         assert version in ["old", "new"]
+        rng = rng or random
         mines = mines or self.mines
-        possible_positions = {(h, w) for h in range(self.height) for w in range(self.width)}
-        possible_positions.remove((first_step.h, first_step.w))
+        excluded = {(first_step.h, first_step.w)}
         if version == "new":
-            for step_around in utils.iter_around(first_step.h, first_step.w):
-                possible_positions.remove(step_around)
+            excluded.update(utils.iter_around(first_step.h, first_step.w, self.height, self.width))
+        # in row-major order, thus mines only depend on the random state
+        possible_positions = [(h, w) for h in range(self.height) for w in range(self.width) if (h, w) not in excluded]
         assert len(possible_positions) >= mines, f"Board is too small to contain {mines} mines."
-        mine_positions = random.sample(possible_positions, mines)
+        mine_positions = rng.sample(possible_positions, mines)
         for h, w in mine_positions:
-            self.board[h][w] = MINE
+            self.set(h, w, MINE)
         return mine_positions
 
     def init_hints(self):
-        for h in range(self.height):
-            for w in range(self.width):
-                if self.board[h][w] != MINE:
-                    self.board[h][w] = str(sum(self.board[around_h][around_w] == MINE
-                                           for around_h, around_w in utils.iter_around(h, w, self.height, self.width)))
-        return self.board
+        if self.backend == "numpy":
+            # count mines around all cells at once with shifted views of the padded mine grid
+            mines = np.pad(self.grid() == MINE_CODE, 1).astype(np.int8)
+            counts = sum(mines[1 + bias_h: 1 + bias_h + self.height, 1 + bias_w: 1 + bias_w + self.width]
+                         for bias_h, bias_w in utils.biases)
+            self.codes = np.where(self.codes == MINE_CODE, MINE_CODE, counts.ravel()).astype(np.int8)
+            return self.codes
+
+        # scatter each mine to tiles around it instead of counting mines around each tile
+        codes = self.codes
+        indices_around = utils.neighbor_indices(self.height, self.width)
+        mine_indices = [index for index, code in enumerate(codes) if code == MINE_CODE]
+        for index, code in enumerate(codes):
+            if code != MINE_CODE:
+                codes[index] = 0
+        for index in mine_indices:
+            for around_index in indices_around[index]:
+                if codes[around_index] != MINE_CODE:
+                    codes[around_index] += 1
+        return self.codes
+
+    def init_openings(self):
+        indices_around = utils.neighbor_indices(self.height, self.width)
+        codes = self.codes.tolist() if self.backend == "numpy" else self.codes
+        labels = [-1] * (self.height * self.width)
+        openings = []
+        for start, code in enumerate(codes):
+            if code != 0 or labels[start] != -1:
+                continue
+            label = len(openings)
+            labels[start] = label
+            opening, visited = [start], {start}
+            stack = [start]
+            while stack:
+                index = stack.pop()
+                for around_index in indices_around[index]:
+                    if around_index in visited:
+                        continue
+                    visited.add(around_index)
+                    opening.append(around_index)
+                    if codes[around_index] == 0:
+                        labels[around_index] = label
+                        stack.append(around_index)
+            openings.append(opening)
+
+        self.opening_labels = labels
+        self.opening_indices = openings
+        self.opening_positions = [[divmod(index, self.width) for index in opening] for opening in openings]
+        return openings
 
-    def initialize(self, version="old", first_step=None):
+    def opening_of(self, h, w):
+        """
+        :return: index of the opening which (h, w) belongs to, None if (h, w) is not "0" or openings are not built
+        """
+        if self.opening_labels is None:
+            return None
+        label = self.opening_labels[h * self.width + w]
+        return label if label >= 0 else None
+
+    def initialize(self, version="old", first_step=None, seed=None):
+        """
+        :param seed: seed of mines, thus the board only depends on it, global random state is used if None
+        """
         assert version in ["old", "new"]
-        self.board = [[None for w in range(self.width)] for h in range(self.height)]
+        self.codes = self.new_codes(0)
+
+        rng = random.Random(seed) if seed is not None else None
+        self.mine_positions = self.init_mines(first_step=first_step, version=version, rng=rng)
+        self.init_hints()
+        self.init_openings()
 
-        self.mine_positions = self.init_mines(first_step=first_step, version=version)
-        self.board = self.init_hints()
+    def mine_bits(self):
+        """
+        :return: mines packed into bytes, bit (h * width + w) in little endian order is set if (h, w) is a mine
+        """
+        if self.backend == "numpy":
+            return np.packbits(self.codes == MINE_CODE, bitorder="little").tobytes()
+        packed = 0
+        for index, code in enumerate(self.codes):
+            if code == MINE_CODE:
+                packed |= 1 << index
+        return packed.to_bytes((self.height * self.width + 7) // 8, "little")
+
+    @classmethod
+    def from_mine_bits(cls, height, width, bits, backend=None):
+        """
+        rebuild back side from mine_bits(), hints are scattered from mines and openings are rebuilt
+        :param bits: bytes-like, e.g., a memoryview of a memory-mapped corpus
+        """
+        back_side = cls(height, width, 0, backend)
+        size = height * width
+        if back_side.backend == "numpy":
+            is_mine = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), count=size, bitorder="little").astype(bool)
+            back_side.codes = np.where(is_mine, MINE_CODE, 0).astype(np.int8)
+            mine_indices = np.flatnonzero(is_mine).tolist()
+        else:
+            mine_indices = [bit.bit_length() - 1 for bit in utils.iter_bits(int.from_bytes(bits, "little"))]
+            back_side.codes = back_side.new_codes(0)
+            for index in mine_indices:
+                back_side.codes[index] = MINE_CODE
+        back_side.mines = len(mine_indices)
+        back_side.mine_positions = [divmod(index, width) for index in mine_indices]
+        back_side.init_hints()
+        back_side.init_openings()
+        return back_side
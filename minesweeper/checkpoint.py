@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/18 22:15
+# Author  : Yichen Lu
+
+import struct
+
+from minesweeper import board, interact, chunked
+from global_variables import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"MSCK"
+LOG_MAGIC = b"MSLG"
+FORMAT_VERSION = 1
+# magic, version, height, width, mines, state bits, followed by front side codes packed into 4 bits (two codes in a
+# byte) and mine bits of back side
+HEADER = struct.Struct("<4sBHHIB")
+STATE_OVER, STATE_WIN, STATE_DRAW = 1, 2, 4
+# move in game log: method (MOVE_INTERACT or MOVE_BATCH) and number of ops, followed by ops in uint32
+MOVE = struct.Struct("<BI")
+MOVE_INTERACT, MOVE_BATCH = 0, 1
+
+
+def pack_codes(codes):
+    """
+    pack cell codes (0 - 11) into 4 bits each
+    """
+    if np is not None and isinstance(codes, np.ndarray):
+        padded = np.zeros(len(codes) + len(codes) % 2, dtype=np.uint8)
+        padded[:len(codes)] = codes
+        return (padded[0::2] | (padded[1::2] << 4)).astype(np.uint8).tobytes()
+    padded = list(codes) + [0] * (len(codes) % 2)
+    return bytes(low | (high << 4) for low, high in zip(padded[0::2], padded[1::2]))
+
+
+def unpack_codes(data, size, backend=None):
+    backend = backend or BOARD_BACKEND
+    if backend == "numpy":
+        packed = np.frombuffer(data, dtype=np.uint8)
+        codes = np.empty(2 * len(packed), dtype=np.int8)
+        codes[0::2] = packed & 0xF
+        codes[1::2] = packed >> 4
+        return codes[:size].copy()
+    codes = []
+    for byte in data:
+        codes.append(byte & 0xF)
+        codes.append(byte >> 4)
+    return codes[:size]
+
+
+def dumps(context):
+    front_side = context.front_side
+    if isinstance(front_side, chunked.ChunkedFrontSide) or isinstance(context.back_side, chunked.ChunkedBackSide):
+        # codes and mine bits of the whole board would be materialized
+        raise ValueError("Chunked boards cannot be checkpointed or recorded.")
+    state = STATE_OVER * context.is_over | STATE_WIN * context.is_win | STATE_DRAW * context.is_draw
+    return HEADER.pack(MAGIC, FORMAT_VERSION, front_side.height, front_side.width, front_side.mines, state) + \
+        pack_codes(front_side.codes) + context.back_side.mine_bits()
+
+
+def loads(data, backend=None):
+    """
+    :param data: bytes-like starting with a checkpoint
+    :return: context, number of bytes of the checkpoint
+    """
+    magic, version, height, width, mines, state = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Invalid checkpoint.")
+    size = height * width
+    codes_end = HEADER.size + (size + 1) // 2
+    bits_end = codes_end + (size + 7) // 8
+    if len(data) < bits_end:
+        raise ValueError("Truncated checkpoint.")
+
+    front_side = board.FrontSide(height, width, mines, backend)
+    front_side.codes = unpack_codes(data[HEADER.size: codes_end], size, front_side.backend)
+    # a mine is uncovered in game over
+    front_side.rebuild_from_board(allow_mines=True)
+    back_side = board.BackSide.from_mine_bits(height, width, data[codes_end: bits_end], backend)
+    context = interact.Context(front_side, back_side, is_draw=bool(state & STATE_DRAW))
+    context.is_over = bool(state & STATE_OVER)
+    context.is_win = bool(state & STATE_WIN)
+    return context, bits_end
+
+
+def save(context, path):
+    data = dumps(context)
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def load(path, backend=None):
+    with open(path, "rb") as file:
+        context, _ = loads(file.read(), backend)
+    return context
+
+
+def encode_op(op, width):
+    return (op.h * width + op.w) << 1 | (op.op == "flag")
+
+
+def decode_op(code, width):
+    h, w = divmod(code >> 1, width)
+    return interact.Operation(h, w, "flag" if code & 1 else "step")
+
+
+class GameLog(object):
+    """
+    Append-only log of a game: a checkpoint of the context when the log starts, followed by ops of each move in the
+    order they are applied. Each op takes 4 bytes, thus logging costs a buffered write per move.
+    """
+    def __init__(self, path, context):
+        self.path = path
+        self.width = context.front_side.width
+        data = dumps(context)
+        self.file = open(path, "wb")
+        self.file.write(LOG_MAGIC)
+        self.file.write(data)
+
+    def record(self, ops, method=MOVE_INTERACT):
+        """
+        :param ops: list of ops of a move
+        :param method: MOVE_INTERACT for Context.interact() and MOVE_BATCH for Context.interact_batch()
+        """
+        self.file.write(MOVE.pack(method, len(ops)))
+        self.file.write(struct.pack(f"<{len(ops)}I", *(encode_op(op, self.width) for op in ops)))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    @staticmethod
+    def iter_moves(data, offset, width):
+        """
+        :return: iterator of (method, ops) of moves
+        """
+        while offset < len(data):
+            method, n_ops = MOVE.unpack_from(data, offset)
+            offset += MOVE.size
+            codes = struct.unpack_from(f"<{n_ops}I", data, offset)
+            offset += 4 * n_ops
+            yield method, [decode_op(code, width) for code in codes]
+
+    @classmethod
+    def replay(cls, path, moves=None, backend=None):
+        """
+        :param moves: number of moves to replay, all moves if None
+        :return: context after the moves
+        """
+        with open(path, "rb") as file:
+            data = file.read()
+        if data[:len(LOG_MAGIC)] != LOG_MAGIC:
+            raise ValueError(f"Invalid game log: {path}.")
+        context, size = loads(memoryview(data)[len(LOG_MAGIC):], backend)
+        for i, (method, ops) in enumerate(cls.iter_moves(data, len(LOG_MAGIC) + size, context.front_side.width)):
+            if moves is not None and i >= moves:
+                break
+            if method == MOVE_BATCH:
+                context.interact_batch(ops)
+            else:
+                context.interact(ops)
+        return context
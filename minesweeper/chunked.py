@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/18 23:30
+# Author  : Yichen Lu
+
+import random
+
+import utils
+from minesweeper.board import FrontSide, BackSide
+from global_variables import *
+
+
+class ChunkedCodes(object):
+    """
+    Flat codes (h * width + w) stored in square chunks of chunk_size x chunk_size. A chunk is materialized on its
+    first write, or on its first access if materialize is given, otherwise unmaterialized cells read as fill.
+    """
+    def __init__(self, height, width, chunk_size, fill, materialize=None):
+        self.height = height
+        self.width = width
+        self.chunk_size = chunk_size
+        self.fill = fill
+        self.materialize = materialize
+        # (chunk h, chunk w) -> bytearray of chunk_size * chunk_size codes
+        self.chunks = dict()
+
+    def __len__(self):
+        return self.height * self.width
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def locate(self, index):
+        """
+        :return: key of the chunk, offset in the chunk
+        """
+        h, w = divmod(index, self.width)
+        chunk_h, offset_h = divmod(h, self.chunk_size)
+        chunk_w, offset_w = divmod(w, self.chunk_size)
+        return (chunk_h, chunk_w), offset_h * self.chunk_size + offset_w
+
+    def chunk(self, key):
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.materialize(key) if self.materialize else bytearray([self.fill]) * self.chunk_size ** 2
+            self.chunks[key] = chunk
+        return chunk
+
+    def __getitem__(self, index):
+        # locate() inlined, called for every lookup of a cell
+        h, w = divmod(index, self.width)
+        size = self.chunk_size
+        chunk = self.chunks.get((h // size, w // size))
+        if chunk is None:
+            if self.materialize is None:
+                return self.fill
+            chunk = self.chunk((h // size, w // size))
+        return chunk[h % size * size + w % size]
+
+    def __setitem__(self, index, code):
+        key, offset = self.locate(index)
+        self.chunk(key)[offset] = code
+
+    def copy(self):
+        codes = ChunkedCodes(self.height, self.width, self.chunk_size, self.fill, self.materialize)
+        codes.chunks = {key: bytearray(chunk) for key, chunk in self.chunks.items()}
+        return codes
+
+    @property
+    def nbytes(self):
+        return len(self.chunks) * self.chunk_size ** 2
+
+
+class CellSet(object):
+    """
+    Implicit set of all cells of a board except the removed ones, e.g., unseens of a chunked front side, thus its
+    memory is proportional to the removed cells. Iteration visits the whole board and should be avoided.
+    """
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.removed = set()
+
+    def __len__(self):
+        return self.height * self.width - len(self.removed)
+
+    def __contains__(self, position):
+        h, w = position
+        return 0 <= h < self.height and 0 <= w < self.width and position not in self.removed
+
+    def __iter__(self):
+        for h in range(self.height):
+            for w in range(self.width):
+                if (h, w) not in self.removed:
+                    yield h, w
+
+    def add(self, position):
+        self.removed.discard(position)
+
+    def discard(self, position):
+        self.removed.add(position)
+
+    def remove(self, position):
+        if position not in self:
+            raise KeyError(position)
+        self.removed.add(position)
+
+    def difference_update(self, positions):
+        self.removed.update(positions)
+
+    def choice(self, rng=random):
+        """
+        random cell by rejection sampling, no cells are listed
+        """
+        if len(self) == 0:
+            raise IndexError("Cannot choose from an empty set.")
+        while True:
+            position = rng.randrange(self.height), rng.randrange(self.width)
+            if position not in self.removed:
+                return position
+
+
+class InlandSet(object):
+    """
+    Implicit inland unseens of a front side, i.e., unseens which are not frontier unseens. It follows unseens and
+    frontier unseens of the front side, thus add() and discard() by FrontSide.update_frontier() are no-ops.
+    """
+    def __init__(self, front_side):
+        self.front_side = front_side
+
+    def __len__(self):
+        return len(self.front_side.unseens) - len(self.front_side.frontier_unseens)
+
+    def __contains__(self, position):
+        return position in self.front_side.unseens and position not in self.front_side.frontier_unseens
+
+    def __iter__(self):
+        for position in self.front_side.unseens:
+            if position not in self.front_side.frontier_unseens:
+                yield position
+
+    def add(self, position):
+        pass
+
+    def discard(self, position):
+        pass
+
+    def choice(self, rng=random):
+        if len(self) == 0:
+            raise IndexError("Cannot choose from an empty set.")
+        while True:
+            position = self.front_side.unseens.choice(rng)
+            if position not in self.front_side.frontier_unseens:
+                return position
+
+
+class ChunkedFrontSide(FrontSide):
+    """
+    Front side of a very large board, unseen cells are not stored: codes are chunked and only chunks with uncovered
+    tiles or flags are materialized, unseens and inland unseens are implicit sets, thus memory is proportional to
+    the revealed area. Hints, flags and frontier sets are plain sets as in FrontSide.
+    """
+    def __init__(self, height, width, mines, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        super().__init__(height, width, mines, backend="list")
+
+    def new_codes(self, code):
+        return ChunkedCodes(self.height, self.width, self.chunk_size, code)
+
+    def initialize(self):
+        self.codes = self.new_codes(UNSEEN_CODE)
+        self.hints = set()
+        self.unseens = CellSet(self.height, self.width)
+        self.flags = set()
+
+        self.incomplete_hints = set()
+        self.frontier_unseens = set()
+        self.inland_unseens = InlandSet(self)
+        self.synced_codes = self.codes.copy()
+
+    def rebuild_from_board(self, allow_mines=False):
+        # unseens of the whole board would be visited, thus chunked front sides are only updated by their contexts
+        raise ValueError("Chunked boards cannot be rebuilt from their codes.")
+
+
+class ChunkedBackSide(BackSide):
+    """
+    Back side of a very large board generated chunk by chunk. Mines of a chunk only depend on the seed of the board and
+    the key of the chunk, and number of mines of each chunk is fixed by its share of the board, thus the board has
+    exactly such number of mines. Note that mines are thus not placed uniformly over the board, while probabilities of
+    level 3 inference assume uniform placement, thus they are approximations on chunked boards. Codes of a chunk are
+    materialized on first access, from mines of the chunk and the chunks around it. Openings are not built, thus steps
+    are flooded by BFS. Chunked boards are not checkpointed (see checkpoint.dumps()).
+    """
+    def __init__(self, height, width, mines, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.seed = None
+        # positions without mines, i.e., the first step (and positions around it in new version)
+        self.excluded = set()
+        # key of chunk -> flat indices of mines in the chunk, generated for materialized chunks and chunks around them
+        self.chunk_mines = dict()
+        super().__init__(height, width, mines, backend="list")
+
+    def new_codes(self, code):
+        return ChunkedCodes(self.height, self.width, self.chunk_size, code, materialize=self.materialize_chunk)
+
+    def initialize(self, version="old", first_step=None, seed=None):
+        """
+        :param seed: seed of the board, a random one from global random state if None
+        """
+        assert version in ["old", "new"]
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.excluded = {(first_step.h, first_step.w)}
+        if version == "new":
+            self.excluded.update(utils.iter_around(first_step.h, first_step.w, self.height, self.width))
+        self.chunk_mines = dict()
+        self.codes = self.new_codes(0)
+
+    def chunk_bounds(self, key):
+        """
+        :return: rows and columns of the chunk
+        """
+        chunk_h, chunk_w = key
+        top, left = chunk_h * self.chunk_size, chunk_w * self.chunk_size
+        return range(top, min(top + self.chunk_size, self.height)), range(left, min(left + self.chunk_size, self.width))
+
+    def count_chunk_mines(self, key):
+        """
+        number of mines of the chunk, i.e., difference of the shares of mines of cells up to the chunk and before it,
+        where chunks are in row-major order
+        """
+        rows, cols = self.chunk_bounds(key)
+        before = rows.start * self.width + len(rows) * cols.start
+        size = self.height * self.width
+        return self.mines * (before + len(rows) * len(cols)) // size - self.mines * before // size
+
+    def mines_of_chunk(self, key):
+        mines = self.chunk_mines.get(key)
+        if mines is None:
+            rows, cols = self.chunk_bounds(key)
+            possible_indices = [h * self.width + w for h in rows for w in cols if (h, w) not in self.excluded]
+            n_mines = self.count_chunk_mines(key)
+            assert len(possible_indices) >= n_mines, f"Chunk {key} is too small to contain {n_mines} mines."
+            # str seeds are hashed by sha512 in random.Random, thus chunks are the same among processes
+            rng = random.Random(f"{self.seed}/{key[0]}/{key[1]}")
+            mines = self.chunk_mines[key] = frozenset(rng.sample(possible_indices, n_mines))
+        return mines
+
+    def materialize_chunk(self, key):
+        chunk_h, chunk_w = key
+        rows, cols = self.chunk_bounds(key)
+        top, left, size = rows.start, cols.start, self.chunk_size
+        chunk = bytearray(size * size)
+        for index in self.mines_of_chunk(key):
+            h, w = divmod(index, self.width)
+            chunk[(h - top) * size + w - left] = MINE_CODE
+
+        # scatter mines of the chunk and chunks around it to tiles of the chunk
+        positions_around = utils.neighbor_positions(self.height, self.width)
+        n_chunk_h, n_chunk_w = -(-self.height // size), -(-self.width // size)
+        for around_h in range(max(chunk_h - 1, 0), min(chunk_h + 2, n_chunk_h)):
+            for around_w in range(max(chunk_w - 1, 0), min(chunk_w + 2, n_chunk_w)):
+                for index in self.mines_of_chunk((around_h, around_w)):
+                    for h, w in positions_around[index]:
+                        if top <= h < top + size and left <= w < left + size:
+                            offset = (h - top) * size + w - left
+                            if chunk[offset] != MINE_CODE:
+                                chunk[offset] += 1
+        return chunk
+
+    def mine_bits(self):
+        # mines of all chunks would be generated
+        raise ValueError("Chunked boards cannot be packed into mine bits.")
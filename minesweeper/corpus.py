@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/18 21:40
+# Author  : Yichen Lu
+
+import mmap
+import struct
+import random
+import argparse
+
+from minesweeper import board, interact
+from global_variables import *
+
+MAGIC = b"MSBC"
+FORMAT_VERSION = 1
+# magic, version, height, width, mines, number of boards
+HEADER = struct.Struct("<4sBHHIQ")
+# seed of the board, first step (h, w), followed by mine bits
+RECORD_PREFIX = struct.Struct("<QHH")
+
+
+def record_struct(height, width):
+    return struct.Struct(f"{RECORD_PREFIX.format}{(height * width + 7) // 8}s")
+
+
+class CorpusWriter(object):
+    """
+    Write boards into a corpus file of fixed size records, each of which is the seed of the board, the first step and
+    mines packed into bits (see BackSide.mine_bits()).
+    """
+    def __init__(self, path, height, width, mines):
+        self.path = path
+        self.height = height
+        self.width = width
+        self.mines = mines
+        self.record = record_struct(height, width)
+        self.count = 0
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, height, width, mines, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, back_side: board.BackSide, first_step: interact.Operation, seed=0):
+        assert (back_side.height, back_side.width) == (self.height, self.width)
+        self.file.write(self.record.pack(seed, first_step.h, first_step.w, back_side.mine_bits()))
+        self.count += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        # number of boards is written at last
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, self.height, self.width, self.mines, self.count))
+        self.file.close()
+
+
+class Corpus(object):
+    """
+    Read-only corpus of boards through a memory map, thus boards are read on demand without parsing the file, and
+    mine bits are given as memoryviews of the map.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.height, self.width, self.mines, self.count = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Invalid board corpus: {path}.")
+        self.record = record_struct(self.height, self.width)
+        if len(self.map) < HEADER.size + self.count * self.record.size:
+            raise ValueError(f"Truncated board corpus: {path}.")
+        self.view = memoryview(self.map)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        """
+        :return: seed, first step, mine bits
+        """
+        if not 0 <= i < self.count:
+            raise IndexError(f"Board index out of range: {i}.")
+        offset = HEADER.size + i * self.record.size
+        seed, h, w = RECORD_PREFIX.unpack_from(self.map, offset)
+        bits = self.view[offset + RECORD_PREFIX.size: offset + self.record.size]
+        return seed, interact.Operation(h, w, "step"), bits
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def back_side(self, i, backend=None):
+        _, _, bits = self[i]
+        return board.BackSide.from_mine_bits(self.height, self.width, bits, backend)
+
+    def context(self, i, backend=None):
+        """
+        :return: context of board i with its first step taken
+        """
+        _, first_step, bits = self[i]
+        front_side = board.FrontSide(self.height, self.width, self.mines, backend)
+        front_side.initialize()
+        back_side = board.BackSide.from_mine_bits(self.height, self.width, bits, backend)
+        context = interact.Context(front_side, back_side)
+        context.interact(first_step)
+        return context
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+
+
+def generate(path, boards, seed=0, height=HEIGHT, width=WIDTH, mines=MINES, first_step=None):
+    """
+    generate seeded boards into a corpus, board i only depends on seed and i
+    """
+    if first_step is None:
+        first_step = interact.Operation(2, 2, "step") if VERSION == "new" else interact.Operation(0, 0, "step")
+    rng = random.Random(seed)
+    with CorpusWriter(path, height, width, mines) as writer:
+        for _ in range(boards):
+            board_seed = rng.getrandbits(64)
+            # same mines as BackSide.initialize(seed=board_seed), hints and openings are not needed to be saved
+            back_side = board.BackSide(height, width, mines)
+            back_side.codes = back_side.new_codes(0)
+            back_side.init_mines(first_step=first_step, version=VERSION, rng=random.Random(board_seed))
+            writer.write(back_side, first_step, board_seed)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a corpus of seeded boards.")
+    parser.add_argument("--boards", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--height", type=int, default=HEIGHT)
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--mines", type=int, default=MINES)
+    parser.add_argument("--output", type=str, default="boards.bin")
+    args = parser.parse_args()
+    generate(args.output, args.boards, args.seed, args.height, args.width, args.mines)
+    print(f"Save {args.boards} boards to {args.output}.")
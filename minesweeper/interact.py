@@ -4,11 +4,12 @@
 
 import os
 import time
-import pickle
 from pathlib import Path
 import utils
 from typing import Union, Iterable
 from minesweeper import FrontSide, BackSide
+from minesweeper.board import CODE_TO_VALUE
+from minesweeper import checkpoint
 from global_variables import *
 from collections import deque
 
@@ -28,6 +29,30 @@ class Operation(object):
         return hash(self) == hash(other)
 
 
+class ChangeSet(object):
+    """
+    Changes of front side made by a batch of ops, thus front sides and frontier structures elsewhere can be updated
+    with changed tiles only.
+    """
+    def __init__(self):
+        # position -> value (hint or MINE) of newly uncovered tiles
+        self.revealed = dict()
+        self.flags = []
+        self.unflags = []
+        self.status = "OK"
+
+    def __len__(self):
+        return len(self.revealed) + len(self.flags) + len(self.unflags)
+
+    def __repr__(self):
+        return f"ChangeSet(revealed={len(self.revealed)}, flags={len(self.flags)}, unflags={len(self.unflags)}, " \
+               f"status={self.status})"
+
+    @property
+    def positions(self):
+        return list(self.revealed) + self.flags + self.unflags
+
+
 class Context(object):
     def __init__(self, front_side: FrontSide, back_side: BackSide, is_draw=True):
         self.front_side = front_side
@@ -35,6 +60,26 @@ class Context(object):
         self.is_over = False
         self.is_win = False
         self.is_draw = is_draw
+        # game log recording ops of each move, see record()
+        self.log = None
+
+    @property
+    def height(self):
+        return self.front_side.height
+
+    @property
+    def width(self):
+        return self.front_side.width
+
+    @property
+    def mines(self):
+        return self.front_side.mines
+
+    def __getstate__(self):
+        # copies do not share the game log
+        state = self.__dict__.copy()
+        state["log"] = None
+        return state
 
     def draw(self, hide_back_side=True, prefix=None):
         front_side_s = self.front_side.draw_board()
@@ -58,7 +103,9 @@ class Context(object):
             print("Congratulations!")
 
     def interact(self, ops: Union[Operation, Iterable]):
-        ops = ops if isinstance(ops, Iterable) else [ops]
+        ops = list(ops) if isinstance(ops, Iterable) else [ops]
+        if self.log is not None:
+            self.log.record(ops, checkpoint.MOVE_INTERACT)
         for op in ops:
             if op.op == "step":
                 signal = self.step(op.h, op.w)
@@ -74,10 +121,91 @@ class Context(object):
                 self.is_win = True
                 return "WIN"
 
-    def uncover(self, h, w):
+    def interact_batch(self, ops: Union[Operation, Iterable]) -> ChangeSet:
+        """
+        apply ops together, flags first and then all steps flooded in one pass, frontier is updated once.
+        Unlike interact(), ops after a winning step are still applied.
+        :return: change set of front side
+        """
+        ops = list(ops) if isinstance(ops, Iterable) else [ops]
+        if self.log is not None:
+            self.log.record(ops, checkpoint.MOVE_BATCH)
+        changes = ChangeSet()
+        steps = []
+        for op in ops:
+            if op.op == "step":
+                steps.append((op.h, op.w))
+            elif op.op == "flag":
+                self.toggle_flag(op.h, op.w, changes)
+            else:
+                raise ValueError(f"Invalid op type: {op.op}.")
+
+        seeds = []
+        for h, w in steps:
+            if self.front_side.get(h, w) != UNSEEN:
+                continue
+            elif self.back_side.get(h, w) == MINE:
+                self.uncover(h, w, update_frontier=False)
+                changes.revealed[(h, w)] = MINE
+                changes.status = "OVER"
+                break
+            seeds.append((h, w))
+        self.flood(seeds, changes)
+        self.front_side.update_frontier(changes.positions)
+
+        if changes.status == "OVER":
+            self.is_over = True
+        elif seeds and (self.front_side.remains == len(self.front_side.unseens) or self.front_side.remains == 0):
+            # as in step(), only a step on an unseen tile wins
+            changes.status = "WIN"
+            self.is_win = True
+        return changes
+
+    def flood(self, seeds, changes: ChangeSet):
+        """
+        uncover safe tiles at seeds and openings around them without updating frontier
+        """
+        front_codes, back_codes = self.front_side.codes, self.back_side.codes
+        width = self.width
+        indices_around = utils.neighbor_indices(self.height, width)
+        uncovered = []
+        queue = deque()
+        for h, w in seeds:
+            label = self.back_side.opening_of(h, w)
+            if label is not None and front_codes[h * width + w] == UNSEEN_CODE:
+                # tiles around an opening may have been uncovered with another opening
+                unseens = [position for position, index in zip(self.back_side.opening_positions[label],
+                                                               self.back_side.opening_indices[label])
+                           if front_codes[index] == UNSEEN_CODE]
+                if self.uncover_opening(label, update_frontier=False):
+                    uncovered.extend(unseens)
+                    continue
+            queue.append(h * width + w)
+
+        while queue:
+            index = queue.popleft()
+            if front_codes[index] != UNSEEN_CODE:
+                continue
+            code = back_codes[index]
+            if code == MINE_CODE:
+                raise RuntimeError
+            front_codes[index] = code
+            uncovered.append(divmod(index, width))
+            if code == 0:
+                queue.extend(around_index for around_index in indices_around[index]
+                             if front_codes[around_index] == UNSEEN_CODE)
+
+        self.front_side.unseens.difference_update(uncovered)
+        self.front_side.hints.update(uncovered)
+        for position in uncovered:
+            changes.revealed[position] = CODE_TO_VALUE[back_codes[position[0] * width + position[1]]]
+
+    def uncover(self, h, w, update_frontier=True):
         self.front_side.set(h, w, self.back_side.get(h, w))
         self.front_side.unseens.discard((h, w))
         self.front_side.hints.add((h, w))
+        if update_frontier:
+            self.front_side.update_frontier([(h, w)])
 
     def step(self, h, w):
         if self.front_side.get(h, w) != UNSEEN:
@@ -92,59 +220,113 @@ class Context(object):
             return "OK"
 
     def step_bfs(self, h, w):
+        label = self.back_side.opening_of(h, w)
+        if label is not None and self.uncover_opening(label):
+            return
+
         queue = deque([(h, w)])
+        uncovered = []
         while queue:
             h, w = queue.popleft()
             if self.back_side.get(h, w) == MINE:
                 raise RuntimeError
             elif self.back_side.get(h, w) == 0:
-                self.uncover(h, w)
-                for around_h, around_w in utils.iter_around(h, w, self.back_side.height, self.back_side.width):
+                self.uncover(h, w, update_frontier=False)
+                for around_h, around_w in utils.iter_around(h, w, self.height, self.width):
                     if self.front_side.get(around_h, around_w) == UNSEEN:
                         queue.append((around_h, around_w))
             else:
-                self.uncover(h, w)
+                self.uncover(h, w, update_frontier=False)
+            uncovered.append((h, w))
+        self.front_side.update_frontier(uncovered)
 
-    def flag(self, h, w):
+    def uncover_opening(self, label, update_frontier=True):
+        """
+        uncover a precomputed opening of back side at once
+        :return: False if the opening is blocked by flags and should be flooded tile by tile
+        """
+        front_side = self.front_side
+        indices = self.back_side.opening_indices[label]
+        positions = self.back_side.opening_positions[label]
+        front_codes, back_codes = front_side.codes, self.back_side.codes
+        if any(front_codes[index] == FLAG_CODE for index in indices):
+            return False
+
+        if front_side.backend == "numpy" and self.back_side.backend == "numpy":
+            front_codes[indices] = back_codes[indices]
+        else:
+            for index in indices:
+                front_codes[index] = back_codes[index]
+        front_side.unseens.difference_update(positions)
+        front_side.hints.update(positions)
+        if update_frontier:
+            front_side.update_frontier(positions)
+        return True
+
+    def toggle_flag(self, h, w, changes: ChangeSet):
+        """
+        flag or unflag an unseen tile without updating frontier
+        """
         if self.front_side.get(h, w) == UNSEEN:
             self.front_side.set(h, w, FLAG)
             self.front_side.unseens.remove((h, w))
             self.front_side.flags.add((h, w))
+            changes.flags.append((h, w))
+        elif self.front_side.get(h, w) == FLAG:
+            self.front_side.set(h, w, UNSEEN)
+            self.front_side.unseens.add((h, w))
+            self.front_side.flags.remove((h, w))
+            changes.unflags.append((h, w))
 
+    def flag(self, h, w):
+        if self.front_side.get(h, w) == UNSEEN:
+            self.front_side.set(h, w, FLAG)
+            self.front_side.unseens.remove((h, w))
+            self.front_side.flags.add((h, w))
+            self.front_side.update_frontier([(h, w)])
             return "OK"
         elif self.front_side.get(h, w) == FLAG:
             self.front_side.set(h, w, UNSEEN)
             self.front_side.unseens.add((h, w))
             self.front_side.flags.remove((h, w))
+            self.front_side.update_frontier([(h, w)])
             return "OK"
         else:
             return "OK"
 
-    def save(self):
-        y, m, d, h, M, s, *_ = time.localtime(time.time())
-        now = '-'.join([f"{y}", f"{m:02d}", f"{d:02d}", f"{h:02d}", f"{M:02d}", f"{s:02d}"])
-        path = Path("checkpoints") / (now + ".pkl")
-        with open(path, 'wb') as file:
-            pickle.dump(
-                {
-                    "front_side": self.front_side,
-                    "back_side": self.back_side,
-                    "is_over": self.is_over,
-                    "is_win": self.is_win,
-                    "is_draw": self.is_draw,
-                }, file
-            )
+    def save(self, path=None):
+        """
+        save a compact checkpoint (see checkpoint.py), into checkpoints directory named by time if path is None
+        """
+        if path is None:
+            y, m, d, h, M, s, *_ = time.localtime(time.time())
+            now = '-'.join([f"{y}", f"{m:02d}", f"{d:02d}", f"{h:02d}", f"{M:02d}", f"{s:02d}"])
+            path = Path("checkpoints") / (now + ".ckpt")
+            path.parent.mkdir(exist_ok=True)
+        checkpoint.save(self, path)
         print(f"Save context to {path}.")
 
     def load(self, path=None):
         if path is None:
-            # latest
-            path = sorted(list(Path("checkpoints").iterdir()))[-1]
-        with open(path, 'rb') as file:
-            ckpt = pickle.load(file)
-        self.front_side = ckpt["front_side"]
-        self.back_side = ckpt["back_side"]
-        self.is_over = ckpt["is_over"]
-        self.is_win = ckpt["is_win"]
-        self.is_draw = ckpt["is_draw"]
+            # latest, checkpoints are named by time
+            path = max(Path("checkpoints").glob("*.ckpt"), key=lambda ckpt_path: ckpt_path.name)
+        loaded = checkpoint.load(path, self.front_side.backend)
+        self.front_side = loaded.front_side
+        self.back_side = loaded.back_side
+        self.is_over = loaded.is_over
+        self.is_win = loaded.is_win
+        self.is_draw = loaded.is_draw
         print(f"Load ckpt from {path}.")
+
+    def record(self, path):
+        """
+        start an append-only game log from current context, which is replayed by checkpoint.GameLog.replay()
+        """
+        self.stop_recording()
+        self.log = checkpoint.GameLog(path, self)
+        return self.log
+
+    def stop_recording(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
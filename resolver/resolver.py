@@ -3,6 +3,7 @@
 # Author  : Yichen Lu
 
 import time
+import struct
 from pathlib import Path
 import multiprocessing
 
@@ -11,11 +12,65 @@ import numpy as np
 
 from resolver.key_points import *
 from global_variables import *
-from skimage.feature import hog
+from minesweeper.board import CODE_TO_SYMBOL
+from minesweeper.interact import ChangeSet
+
+# HOG parameters, the same as defaults of skimage.feature.hog()
+HOG_ORIENTATIONS = 9
+HOG_PIXELS_PER_CELL = 8
+HOG_CELLS_PER_BLOCK = 3
+# lower edges of orientation bins except the first one, in degrees
+HOG_BIN_EDGES = np.arange(1, HOG_ORIENTATIONS) * (180. / HOG_ORIENTATIONS)
+# gradients of uint8 images are integers in [-255, 255], thus orientation bin of each gradient is looked up in a table
+# indexed by (g_row + 255, g_col + 255) instead of computing arctan2 of each pixel
+_GRADIENTS = np.arange(-255, 256, dtype=np.float64)
+HOG_BIN_TABLE = np.searchsorted(
+    HOG_BIN_EDGES, np.rad2deg(np.arctan2(_GRADIENTS[:, np.newaxis], _GRADIENTS[np.newaxis, :])) % 180, side="right"
+).astype(np.int32)
+
+# top and left pixels of grids in the board screenshot
+GRID_TOPS = np.array([int(BOARD_HEIGHT / HEIGHT * h) for h in range(HEIGHT)])
+GRID_LEFTS = np.array([int(BOARD_WIDTH / WIDTH * w) for w in range(WIDTH)])
+# class (argmax of similarities) -> code of cell
+CLASS_CODES = np.array(list(range(8)) + [FLAG_CODE, UNSEEN_CODE], dtype=np.int8)
+# pixels cropped on each side of grids before classification
+GRID_CROP = 12
+
+
+def splitmix64(x):
+    """
+    splitmix64 of uint64 array x, i.e., a fixed pseudo random uint64 of each number
+    """
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+# pseudo random weight of each pixel of a grid in fingerprints, the same among sessions
+FINGERPRINT_WEIGHTS = splitmix64(np.arange(GRID_H * GRID_W * 3, dtype=np.uint64))
+
+# screenshots are polled in is_win_or_over() at intervals growing from POLL_INTERVAL to POLL_INTERVAL_MAX, for at
+# most POLL_TIMEOUT, in seconds
+POLL_INTERVAL = 0.005
+POLL_INTERVAL_MAX = 0.02
+POLL_TIMEOUT = 1.
+# (left, top, right, bottom) of win and over popups in board screenshots
+WIN_BOX = (WIN_LEFT - LEFT, WIN_TOP - TOP, WIN_RIGHT - LEFT, WIN_BOTTOM - TOP)
+OVER_BOX = (OVER_LEFT - LEFT, OVER_TOP - TOP, OVER_RIGHT - LEFT, OVER_BOTTOM - TOP)
+
+# file of grid cache: header of (magic, version, GRID_H, GRID_W, GRID_CROP, count), then records of (fingerprint, code)
+CACHE_MAGIC = b"MSGC"
+CACHE_VERSION = 1
+CACHE_HEADER = struct.Struct("<4sBHHBI")
+CACHE_RECORD = struct.Struct("<QB")
 
 
 class Resolver(object):
-    def __init__(self, front_side):
+    def __init__(self, front_side, cache=RESOLVER_CACHE):
+        """
+        :param cache: whether grids are looked up in the grid cache before HOG classification, see classify_grids()
+        """
         self.front_side = front_side
 
         self.hints = dict()
@@ -27,6 +82,24 @@ class Resolver(object):
 
         self.src_features = self.load_src()
 
+        # fingerprints of grids of the last frame of board (screenshot) resolved, thus only changed grids are
+        # classified in next resolve()
+        self.fingerprints = None
+        # frame settled after the last ops, see is_win_or_over(), resolved by next resolve() without a new screenshot
+        self.settled = None
+
+        # fingerprint of grid -> code, learned from HOG classification and saved to RESOLVER_CACHE_PATH
+        self.cache = dict() if cache else None
+        self.unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        if cache and RESOLVER_CACHE_PATH and Path(RESOLVER_CACHE_PATH).exists():
+            try:
+                self.load_cache(RESOLVER_CACHE_PATH)
+            except (ValueError, struct.error):
+                # a stale (e.g., of another grid geometry) or truncated cache is dropped, and overwritten when saved
+                self.cache = dict()
+
         # self.pool = multiprocessing.Pool(multiprocessing.cpu_count())
 
     def load_src(self, src_dir="src"):
@@ -65,44 +138,157 @@ class Resolver(object):
 
         return np.stack(src_features)
 
+    @classmethod
+    def extract_feature(cls, image):
+        return cls.extract_features(image[np.newaxis, ...])[0]
+
     @staticmethod
-    def extract_feature(image):
-        feature = hog(image, block_norm="L2-Hys", multichannel=True)
-        # feature = image.flatten()
-        return feature
+    def extract_features(images):
+        """
+        HOG features of a batch of images in one vectorized pass, the same as
+        skimage.feature.hog(image, block_norm="L2-Hys", multichannel=True) of each image
+        :param images: (N, h, w, 3) of uint8
+        :return: (N, n_features)
+        """
+        n, height, width, n_channels = images.shape
+        cell = HOG_PIXELS_PER_CELL
+        n_cells_h, n_cells_w = height // cell, width // cell
+        used_h, used_w = n_cells_h * cell, n_cells_w * cell
+        # channel first (3, N, h, w), pixels of cells and the row and column next to them are enough for gradients
+        images = np.moveaxis(images[:, :used_h + 1, :used_w + 1], 3, 0).astype(np.int32)
+        g_row = np.zeros((n_channels, n, used_h, used_w), dtype=np.int32)
+        g_col = np.zeros((n_channels, n, used_h, used_w), dtype=np.int32)
+        # gradients of the first and the last row (column) of each image are 0
+        last_h, last_w = min(used_h, height - 1), min(used_w, width - 1)
+        g_row[:, :, 1: last_h] = images[:, :, 2: last_h + 1, :used_w] - images[:, :, :last_h - 1, :used_w]
+        g_col[:, :, :, 1: last_w] = images[:, :, :used_h, 2: last_w + 1] - images[:, :, :used_h, :last_w - 1]
+
+        # gradient of the first channel with the largest magnitude at each pixel, compared by exact squared
+        # magnitudes, and selected by arithmetic instead of np.where() on random masks
+        squares = g_row * g_row + g_col * g_col
+        best_row, best_col, best = g_row[0], g_col[0], squares[0]
+        for channel in range(1, n_channels):
+            larger = squares[channel] > best
+            best_row = best_row + larger * (g_row[channel] - best_row)
+            best_col = best_col + larger * (g_col[channel] - best_col)
+            best = np.maximum(best, squares[channel])
+        magnitudes = np.sqrt(best)
+        bins = np.take(HOG_BIN_TABLE, (best_row + 255) * 511 + best_col + 255)
+
+        # histograms of cells: magnitudes of pixels summed by (image, cell, bin)
+        rows, cols = np.arange(n_cells_h * cell) // cell, np.arange(n_cells_w * cell) // cell
+        cells = rows[:, np.newaxis] * n_cells_w + cols[np.newaxis, :]
+        indices = ((np.arange(n)[:, np.newaxis, np.newaxis] * (n_cells_h * n_cells_w) + cells) * HOG_ORIENTATIONS
+                   + bins)
+        histograms = np.bincount(indices.ravel(), weights=magnitudes.ravel(),
+                                 minlength=n * n_cells_h * n_cells_w * HOG_ORIENTATIONS)
+        histograms = histograms.reshape(n, n_cells_h, n_cells_w, HOG_ORIENTATIONS) / cell ** 2
+
+        # blocks of cells (n, n_blocks_h, n_blocks_w, block, block, orientations), normalized by L2-Hys
+        blocks = np.lib.stride_tricks.sliding_window_view(
+            histograms, (HOG_CELLS_PER_BLOCK, HOG_CELLS_PER_BLOCK), axis=(1, 2)).transpose(0, 1, 2, 4, 5, 3)
+        eps = 1e-5
+        blocks = blocks / np.sqrt((blocks ** 2).sum(axis=(3, 4, 5), keepdims=True) + eps ** 2)
+        blocks = np.minimum(blocks, 0.2)
+        blocks = blocks / np.sqrt((blocks ** 2).sum(axis=(3, 4, 5), keepdims=True) + eps ** 2)
+        return blocks.reshape(n, -1)
 
     @staticmethod
-    def gridify(board):
-        grids = []
-        for h in range(HEIGHT):
-            row = []
-            for w in range(WIDTH):
-                top = int(BOARD_HEIGHT / HEIGHT * h)
-                bottom = top + GRID_H
-                left = int(BOARD_WIDTH / WIDTH * w)
-                right = left + GRID_W
-                row.append(np.array(Image.fromarray(board[top: bottom, left: right]),
-                                    dtype=np.float))
-            grids.append(row)
-        return grids
+    def grids(board, crop=0):
+        """
+        grids of the board screenshot, each of which is cropped by crop pixels on each side. Grids are gathered from a
+        sliding window view of the screenshot, thus only the cropped grids are copied.
+        :param board: (BOARD_HEIGHT, BOARD_WIDTH, 3)
+        :return: (HEIGHT * WIDTH, GRID_H - 2 * crop, GRID_W - 2 * crop, 3) in row-major order of grids
+        """
+        height, width = GRID_H - 2 * crop, GRID_W - 2 * crop
+        # (BOARD_HEIGHT - height + 1, BOARD_WIDTH - width + 1, 3, height, width)
+        windows = np.lib.stride_tricks.sliding_window_view(board, (height, width), axis=(0, 1))
+        grids = windows[GRID_TOPS[:, np.newaxis] + crop, GRID_LEFTS[np.newaxis, :] + crop]
+        return grids.reshape(HEIGHT * WIDTH, 3, height, width).transpose(0, 2, 3, 1)
 
-    def classify(self, image):
-        center_cropped = self.center_crop(image)
-        feature = self.normalize(self.extract_feature(center_cropped))
-        feature = feature[np.newaxis, ...]
-
-        similarities = np.matmul(feature, self.src_features.T)
-        argmax = similarities.flatten().argmax()
-        if 0 <= argmax <= 7:
-            return str(argmax)
-        elif argmax == 8:
-            return FLAG
-        elif argmax == 9:
-            return UNSEEN
-        else:
-            raise RuntimeError
+    @staticmethod
+    def fingerprint(grids):
+        """
+        fingerprints of grids, i.e., sums of pixels weighted by FINGERPRINT_WEIGHTS (mod 2 ** 64), which are equal
+        for different grids with probability about 2 ** -64
+        :param grids: (N, h, w, 3) of uint8
+        :return: (N, ) of uint64
+        """
+        pixels = grids.reshape(len(grids), -1)
+        return (pixels * FINGERPRINT_WEIGHTS[:pixels.shape[1]]).sum(axis=1)
+
+    @classmethod
+    def gridify(cls, board):
+        grids = cls.grids(board)
+        return [[grids[h * WIDTH + w] for w in range(WIDTH)] for h in range(HEIGHT)]
 
-    def center_crop(self, image, w=12):
+    def classify(self, image):
+        code = self.classify_batch(self.center_crop(image)[np.newaxis, ...])[0]
+        return CODE_TO_SYMBOL[code]
+
+    def classify_batch(self, images):
+        """
+        classify center cropped grids with a single matrix product
+        :param images: (N, h, w, 3)
+        :return: codes of grids, (N, )
+        """
+        features = self.normalize_rows(self.extract_features(images))
+        similarities = np.matmul(features, self.src_features.T)
+        return CLASS_CODES[similarities.argmax(axis=1)]
+
+    def classify_grids(self, grids, fingerprints):
+        """
+        Grids are looked up in the cache by their fingerprints, and only the missed ones are classified by HOG, once
+        for each distinct fingerprint, whose codes are then cached. Thus classification of grids seen before is a
+        dictionary lookup each.
+        :param grids: center cropped grids, (N, h, w, 3)
+        :param fingerprints: fingerprints of grids, (N, )
+        :return: codes of grids, list of N
+        """
+        if self.cache is None:
+            return self.classify_batch(grids).tolist()
+
+        fingerprints = fingerprints.tolist()
+        codes = [self.cache.get(fingerprint) for fingerprint in fingerprints]
+        # fingerprint -> index of its first missed grid
+        missed = dict()
+        for index, code in enumerate(codes):
+            if code is None:
+                missed.setdefault(fingerprints[index], index)
+        self.misses += len(missed)
+        self.hits += len(codes) - len(missed)
+        if missed:
+            for fingerprint, code in zip(missed, self.classify_batch(grids[list(missed.values())]).tolist()):
+                self.cache[fingerprint] = code
+            self.unsaved += len(missed)
+            codes = [self.cache[fingerprint] for fingerprint in fingerprints]
+        return codes
+
+    def save_cache(self, path=RESOLVER_CACHE_PATH):
+        """
+        save the grid cache if it is changed since loaded or saved
+        """
+        if self.cache is None or not self.unsaved or not path:
+            return
+        with open(path, "wb") as file:
+            file.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, GRID_H, GRID_W, GRID_CROP, len(self.cache)))
+            for fingerprint in sorted(self.cache):
+                file.write(CACHE_RECORD.pack(fingerprint, self.cache[fingerprint]))
+        self.unsaved = 0
+
+    def load_cache(self, path):
+        data = Path(path).read_bytes()
+        magic, version, grid_h, grid_w, crop, count = CACHE_HEADER.unpack_from(data)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION or (grid_h, grid_w, crop) != (GRID_H, GRID_W, GRID_CROP):
+            raise ValueError(f"Invalid grid cache: {path}.")
+        records = data[CACHE_HEADER.size: CACHE_HEADER.size + count * CACHE_RECORD.size]
+        if len(records) != count * CACHE_RECORD.size:
+            raise ValueError(f"Truncated grid cache: {path}.")
+        self.cache.update(CACHE_RECORD.iter_unpack(records))
+        return self
+
+    def center_crop(self, image, w=GRID_CROP):
         return image[w: -w, w: -w, ...]
 
     @staticmethod
@@ -110,39 +296,82 @@ class Resolver(object):
         assert len(feature.shape) == 1
         return feature / np.linalg.norm(feature, ord=2)
 
-    def resolve(self):
-        board = ImageGrab.grab(bbox=(LEFT, TOP, RIGHT, BOTTOM))
-        board = self.image_to_array(board)
-        board = self.gridify(board)
-
-        for h, row in enumerate(board):
-            for w, grid in enumerate(row):
-                board[h][w] = self.classify(grid)
-
-        self.front_side.board = board
-        self.front_side.update_from_board()
-
-    def is_win_or_over(self):
-        # call time.sleep() here because the win or over board cannot pop-up immediately
-        time.sleep(0.05)
-        board = ImageGrab.grab(bbox=(WIN_LEFT, WIN_TOP, WIN_RIGHT, WIN_BOTTOM))
-        board = self.image_to_array(board)
-
-        center_cropped = self.center_crop(board, w=3)
-        feature = self.normalize(self.extract_feature(center_cropped))
-        feature = feature[np.newaxis, ...]
-
-        win_sim = np.matmul(feature, self.win.T).flatten()
-
-        time.sleep(0.05)
-        board = ImageGrab.grab(bbox=(OVER_LEFT, OVER_TOP, OVER_RIGHT, OVER_BOTTOM))
-        board = self.image_to_array(board)
+    @staticmethod
+    def normalize_rows(features):
+        norms = np.linalg.norm(features, ord=2, axis=1, keepdims=True)
+        return features / np.where(norms > 0, norms, 1.)
 
-        center_cropped = self.center_crop(board, w=3)
-        feature = self.normalize(self.extract_feature(center_cropped))
-        feature = feature[np.newaxis, ...]
+    def grab(self):
+        """
+        :return: screenshot of board, (BOARD_HEIGHT, BOARD_WIDTH, 3) of uint8
+        """
+        return self.image_to_array(ImageGrab.grab(bbox=(LEFT, TOP, RIGHT, BOTTOM)))
 
-        over_sim = np.matmul(feature, self.over.T).flatten()
+    def resolve(self):
+        """
+        resolve board from the frame settled in the last is_win_or_over(), or a new screenshot, see resolve_frame()
+        :return: interact.ChangeSet of tiles changed on front side
+        """
+        frame = self.settled if self.settled is not None else self.grab()
+        self.settled = None
+        return self.resolve_frame(frame)
+
+    def resolve_frame(self, frame):
+        """
+        Only grids whose fingerprints differ from those of the last frame are classified (see classify_grids()), and
+        front side is updated with tiles whose codes are changed only. All grids are classified for the first frame or
+        after reset().
+        :param frame: screenshot of board, (BOARD_HEIGHT, BOARD_WIDTH, 3) of uint8
+        :return: interact.ChangeSet of tiles changed on front side
+        """
+        grids = self.grids(frame, crop=GRID_CROP)
+        fingerprints = self.fingerprint(grids)
+        if self.fingerprints is None:
+            changed = np.arange(len(grids))
+        else:
+            changed = np.flatnonzero(fingerprints != self.fingerprints)
+        self.fingerprints = fingerprints
+
+        changes = ChangeSet()
+        if len(changed) == 0:
+            return changes
+        codes = self.front_side.codes
+        positions = []
+        for index, code in zip(changed.tolist(), self.classify_grids(grids[changed], fingerprints[changed])):
+            old_code = codes[index]
+            if old_code == code:
+                continue
+            codes[index] = code
+            h, w = divmod(index, WIDTH)
+            positions.append((h, w))
+            if code <= 8:
+                changes.revealed[(h, w)] = code
+            elif code == FLAG_CODE:
+                changes.flags.append((h, w))
+            elif old_code == FLAG_CODE:
+                changes.unflags.append((h, w))
+        self.front_side.update_cells(positions)
+        return changes
+
+    def reset(self):
+        """
+        forget the last frame, e.g., after front side is changed elsewhere
+        """
+        self.fingerprints = None
+        self.settled = None
+
+    def detect_status(self, frame):
+        """
+        detect win or over popup on a board screenshot
+        :param frame: screenshot of board, (BOARD_HEIGHT, BOARD_WIDTH, 3) of uint8
+        :return: "WIN", "OVER" or "OK"
+        """
+        similarities = []
+        for (left, top, right, bottom), src in [(WIN_BOX, self.win), (OVER_BOX, self.over)]:
+            popup = self.center_crop(frame[top: bottom, left: right], w=3)
+            feature = self.normalize(self.extract_feature(popup))
+            similarities.append(float(np.matmul(src, feature)[0]))
+        win_sim, over_sim = similarities
 
         if win_sim > over_sim and win_sim >= 0.7:
             return "WIN"
@@ -151,5 +380,34 @@ class Resolver(object):
         else:
             return "OK"
 
+    def is_win_or_over(self, timeout=POLL_TIMEOUT):
+        """
+        Poll screenshots of board after ops, instead of sleeping for fixed time, until a popup is detected, or board
+        settles, i.e., the screenshot differs from the last resolved frame and is the same as the previous one. Polling
+        intervals grow from POLL_INTERVAL to POLL_INTERVAL_MAX, thus latency follows the screen. The settled frame is
+        kept for next resolve(), thus each poll is the only screenshot.
+        :param timeout: seconds to poll at most, then the last screenshot is taken as settled
+        :return: "WIN", "OVER" or "OK"
+        """
+        deadline = time.perf_counter() + timeout
+        interval, previous = POLL_INTERVAL, None
+        while True:
+            frame = self.grab()
+            signal = self.detect_status(frame)
+            if signal != "OK":
+                self.settled = None
+                return signal
+            if previous is not None and np.array_equal(frame, previous) and (
+                    self.fingerprints is None or
+                    (self.fingerprint(self.grids(frame, crop=GRID_CROP)) != self.fingerprints).any()):
+                break
+            if time.perf_counter() >= deadline:
+                break
+            previous = frame
+            time.sleep(interval)
+            interval = min(interval * 2, POLL_INTERVAL_MAX)
+        self.settled = frame
+        return signal
+
     def image_to_array(self, image):
         return np.array(image, dtype=np.uint8)[..., :3]
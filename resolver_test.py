@@ -18,7 +18,7 @@ with keyboard.pressed(Key.alt):
 
 time.sleep(1)
 
-front_side = FrontSide(HEIGHT, WIDTH)
+front_side = FrontSide(HEIGHT, WIDTH, MINES)
 front_side.initialize()
 resolver = Resolver(front_side)
 
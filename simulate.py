@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/18 10:12
+# Author  : Yichen Lu
+
+import json
+import time
+import random
+import argparse
+import multiprocessing
+from pathlib import Path
+from functools import partial
+
+import minesweeper
+from minesweeper import interact
+from minesweeper.corpus import Corpus
+from solver import Engine
+from solver.stats import Stats
+from global_variables import *
+
+
+# path -> corpus opened in current process
+corpora = dict()
+
+
+def open_corpus(path):
+    if path not in corpora:
+        corpora[path] = Corpus(path)
+    return corpora[path]
+
+
+def play_a_game(seed, height=HEIGHT, width=WIDTH, mines=MINES, mode="most", stats=False, log_dir=None):
+    """
+    play a complete game with the global random state seeded, thus the game only depends on its seed
+    :param stats: whether to instrument the engine
+    :param log_dir: directory to record the game log in, named by seed
+    :return: result of the game
+    """
+    random.seed(seed)
+    first_step = Engine.first_step()
+    context = minesweeper.initialize(first_step, height, width, mines)
+    return play_a_context(context, seed, mode, stats, log_dir)
+
+
+def play_a_board(index, path, mode="most", stats=False, log_dir=None):
+    """
+    play board index of a corpus with the global random state seeded by the seed of the board
+    """
+    corpus = open_corpus(path)
+    seed, _, _ = corpus[index]
+    random.seed(seed)
+    return play_a_context(corpus.context(index), seed, mode, stats, log_dir)
+
+
+def play_a_context(context, seed, mode="most", stats=False, log_dir=None):
+    context.is_draw = False
+    if log_dir is not None:
+        context.record(Path(log_dir) / f"{seed}.log")
+    engine = Engine(context, stats=stats)
+
+    moves, guesses, latencies, error = 0, 0, [], None
+    while not context.is_over and not context.is_win:
+        start = time.perf_counter()
+        try:
+            ops = engine.what_next(mode=mode)
+        except (ValueError, ZeroDivisionError, RuntimeError) as e:
+            error = repr(e)
+            break
+        latencies.append(time.perf_counter() - start)
+
+        moves += 1
+        if isinstance(ops, interact.Operation):
+            # inference gives a set of ops, a single op comes from guessing
+            guesses += 1
+        else:
+            # apply ops in a fixed order, the order of a set of ops depends on hash seed of the process
+            ops = sorted(ops, key=lambda op: (op.h, op.w, op.op))
+        context.interact_batch(ops)
+    context.stop_recording()
+
+    return {
+        "seed": seed,
+        "win": context.is_win,
+        "moves": moves,
+        "guesses": guesses,
+        "latencies": latencies,
+        "error": error,
+        "stats": engine.stats.summary() if engine.stats is not None else None,
+    }
+
+
+def percentile(values, q):
+    """
+    nearest-rank percentile of sorted values
+    """
+    if not values:
+        return 0.
+    rank = min(len(values) - 1, max(0, round(q / 100. * len(values)) - 1))
+    return values[rank]
+
+
+def summarize(results):
+    results = sorted(results, key=lambda result: result["seed"])
+    n_games = len(results)
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    return {
+        "games": n_games,
+        "wins": sum(result["win"] for result in results),
+        "win_rate": sum(result["win"] for result in results) / n_games,
+        "mean_moves": sum(result["moves"] for result in results) / n_games,
+        "guesses_per_game": sum(result["guesses"] for result in results) / n_games,
+        "errors": sum(result["error"] is not None for result in results),
+        "latency": {
+            "mean": sum(latencies) / len(latencies) if latencies else 0.,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.,
+        },
+        # outcomes of games, identical for the same seed whatever the number of workers is
+        "outcomes": [(result["seed"], result["win"], result["moves"], result["guesses"]) for result in results],
+        "stats": Stats.merge([result["stats"] for result in results]) if results and results[0]["stats"] else None,
+    }
+
+
+def simulate(games, seed=0, height=HEIGHT, width=WIDTH, mines=MINES, mode="most", workers=None, verbose=True,
+             stats=False, corpus=None, log_dir=None):
+    """
+    simulate games in a process pool
+    :param games: number of games
+    :param seed: seed of the whole run, seeds of games are derived from it
+    :param height: height of minesweeper
+    :param width: width of minesweeper
+    :param mines: number of mines
+    :param mode: mode of Engine.what_next()
+    :param workers: number of processes, cpu count for default, games run in current process if workers is 1
+    :param verbose: print progress
+    :param stats: instrument engines and merge their stats into summary
+    :param corpus: path of a board corpus (see minesweeper/corpus.py), the first games boards of which are played
+                   instead of new boards, and seed, height, width and mines are ignored
+    :param log_dir: directory to record game logs in (see minesweeper/checkpoint.py)
+    :return: summary of results
+    """
+    assert mode in ["least", "most"]
+    if log_dir is not None:
+        Path(log_dir).mkdir(parents=True, exist_ok=True)
+    if corpus is not None:
+        games = min(games, len(open_corpus(corpus)))
+        seeds = range(games)
+        play = partial(play_a_board, path=corpus, mode=mode, stats=stats, log_dir=log_dir)
+    else:
+        rng = random.Random(seed)
+        seeds = [rng.getrandbits(64) for _ in range(games)]
+        play = partial(play_a_game, height=height, width=width, mines=mines, mode=mode, stats=stats, log_dir=log_dir)
+    workers = workers or multiprocessing.cpu_count()
+
+    results = []
+
+    def collect(result):
+        results.append(result)
+        if verbose:
+            win_cnt = sum(result["win"] for result in results)
+            print(f"TOTAL: {games}, CNT: {len(results)}, WIN CNT: {win_cnt}, "
+                  f"chance of winning: {(win_cnt / len(results)):.4f}", end="\r")
+
+    if workers == 1:
+        for game_seed in seeds:
+            collect(play(game_seed))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for result in pool.imap_unordered(play, seeds, chunksize=max(1, games // (workers * 16))):
+                collect(result)
+    if verbose:
+        print()
+
+    return summarize(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate chance of winning with multiple processes.")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--height", type=int, default=HEIGHT)
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--mines", type=int, default=MINES)
+    parser.add_argument("--mode", choices=["least", "most"], default="most")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", type=str, default=None, help="path to save summary in json")
+    parser.add_argument("--stats", action="store_true", help="instrument engines and print stats of solver")
+    parser.add_argument("--corpus", type=str, default=None, help="path of a board corpus to play")
+    parser.add_argument("--log-dir", type=str, default=None, help="directory to record game logs in")
+    args = parser.parse_args()
+
+    start = time.time()
+    summary = simulate(args.games, args.seed, args.height, args.width, args.mines, args.mode, args.workers,
+                       stats=args.stats, corpus=args.corpus, log_dir=args.log_dir)
+    latency = summary["latency"]
+    print(f"CNT: {summary['games']}, WIN CNT: {summary['wins']}, chance of winning: {summary['win_rate']:.4f}")
+    print(f"mean moves: {summary['mean_moves']:.2f}, guesses per game: {summary['guesses_per_game']:.2f}, "
+          f"errors: {summary['errors']}")
+    print(f"latency per move (ms): mean {latency['mean'] * 1e3:.2f}, p50 {latency['p50'] * 1e3:.2f}, "
+          f"p90 {latency['p90'] * 1e3:.2f}, p99 {latency['p99'] * 1e3:.2f}, max {latency['max'] * 1e3:.2f}")
+    print(f"time: {time.time() - start:.2f}s")
+    if summary["stats"] is not None:
+        print(Stats.format(summary["stats"]))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,4 +4,7 @@
 
 from solver.attempt import *
 from solver.counter import *
+from solver.linear import *
+from solver.sampler import *
+from solver.equivalence import *
 from solver.engine import *
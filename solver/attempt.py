@@ -19,3 +19,23 @@ class Attempt(object):
         if not isinstance(other, type(self)):
             return RuntimeError
         return hash(self) == hash(other)
+
+
+class BitAttempt(object):
+    """
+    attempt of a hint in BitPseudoContext, pseudo flags and pseudo hints are bitmasks of unseens
+    """
+    __slots__ = ["hint", "flag_mask", "hint_mask"]
+
+    def __init__(self, hint, flag_mask, hint_mask):
+        self.hint = hint
+        self.flag_mask = flag_mask
+        self.hint_mask = hint_mask
+
+    def __hash__(self):
+        return hash((self.hint, self.flag_mask, self.hint_mask))
+
+    def __eq__(self, other):
+        if not isinstance(other, type(self)):
+            return RuntimeError
+        return hash(self) == hash(other)
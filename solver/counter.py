@@ -4,6 +4,7 @@
 
 import math
 from itertools import chain
+from functools import lru_cache
 from collections import defaultdict
 
 
@@ -17,6 +18,8 @@ class Counter(object):
         self.cnt = 0
         self.position_cnt = dict()
         self.pseudo_contexts = dict()
+        # search nodes visited to build the counter
+        self.n_nodes = 0
 
     def update(self, pseudo_context, consider_remains=False, context=None):
         """
@@ -75,64 +78,106 @@ class Counter(object):
                 self.position_cnt[unseen][1] += 1
 
     def deep_update(self, pseudo_context):
-        if len(pseudo_context.pseudo_flags) not in self.pseudo_contexts:
+        pseudo_flags, pseudo_hints = pseudo_context.pseudo_flags, pseudo_context.pseudo_hints
+        if len(pseudo_flags) not in self.pseudo_contexts:
             flag_cnts = {
-                **{pseudo_flag: 1. for pseudo_flag in pseudo_context.pseudo_flags},
-                **{pseudo_hint: 0. for pseudo_hint in pseudo_context.pseudo_hints},
+                **{pseudo_flag: 1. for pseudo_flag in pseudo_flags},
+                **{pseudo_hint: 0. for pseudo_hint in pseudo_hints},
             }
-            self.pseudo_contexts[len(pseudo_context.pseudo_flags)] = {"flag_cnts": flag_cnts, "cnt": 1}
+            self.pseudo_contexts[len(pseudo_flags)] = {"flag_cnts": flag_cnts, "cnt": 1}
         else:
-            flag_cnts = self.pseudo_contexts[len(pseudo_context.pseudo_flags)]["flag_cnts"]
-            cnt = self.pseudo_contexts[len(pseudo_context.pseudo_flags)]["cnt"]
-            for pseudo_flag in pseudo_context.pseudo_flags:
+            flag_cnts = self.pseudo_contexts[len(pseudo_flags)]["flag_cnts"]
+            cnt = self.pseudo_contexts[len(pseudo_flags)]["cnt"]
+            for pseudo_flag in pseudo_flags:
                 flag_cnts[pseudo_flag] += 1
-            self.pseudo_contexts[len(pseudo_context.pseudo_flags)] = {"flag_cnts": flag_cnts, "cnt": cnt + 1}
+            self.pseudo_contexts[len(pseudo_flags)] = {"flag_cnts": flag_cnts, "cnt": cnt + 1}
 
     @staticmethod
-    def conclude_with_disjoint_counters(counters, inland_unseens, remains):
-        # UGLY IMPLEMENT
-        def dp(counters):
-            statistics = defaultdict(int)
-            statistics[0] = 1
-            for i, counter in enumerate(counters, start=1):
-                assert counter.mode == "deep"
-                updated = defaultdict(int)
-                for mines, info_dict in counter.pseudo_contexts.items():
-                    cnt = info_dict["cnt"]
-                    for prev_mines, prev_cnt in statistics.items():
-                        if prev_mines + mines <= remains:
-                            updated[prev_mines + mines] += prev_cnt * cnt
-                statistics = updated
-            return statistics
+    def conclude_with_disjoint_counters(counters, inland_unseens, remains, max_inland_probs=None):
+        """
+        Combine disjoint counters, inland unseens and the number of remaining mines into probabilities.
+        Number of mines in counters[:i] (prefix) are convolved from left to right, and weights of placing mines in
+        counters[i + 1:] and inland unseens (suffix) are propagated from right to left, thus time is linear in the
+        number of counters.
+        :param inland_unseens: sized collection, only iterated when inland unseens are listed in probs
+        :param max_inland_probs: inland unseens are listed in probs, hints and flags only if there are at most such
+               number of them (no limit if None), otherwise their shared probability is given as "inland_prob" only
+        """
+        if remains < 0:
+            raise ValueError("No valid solution.")
+        n_inland = len(inland_unseens)
+
+        distributions = []
+        for counter in counters:
+            assert counter.mode == "deep"
+            distributions.append({mines: info_dict["cnt"] for mines, info_dict in counter.pseudo_contexts.items()
+                                  if mines <= remains})
+        # at most max_mines mines in counters, thus numbers of mines in counters are bounded by it instead of remains
+        max_mines = min(remains, sum(max(distribution, default=0) for distribution in distributions))
+
+        # weights[t]: number of ways to place remains - t mines in inland unseens, up to a common factor
+        weights = binomial_ratios(n_inland, remains, max_mines + 1)
+
+        # Counts of each counter are scaled by scales[i], which keeps probabilities since a counter contributes the same
+        # factor to total and to counts of all unseens. Counts are exact integers unless some counter is estimated
+        # (e.g., by sampling, see sampler.py), then weights and counts of each counter are normalized into floats in
+        # [0, 1] by integer division first, since huge integers (e.g., weights of many inland unseens) converted to
+        # floats overflow.
+        scales = [1] * len(counters)
+        if any(isinstance(cnt, float) for counter in counters for info_dict in counter.pseudo_contexts.values()
+               for cnt in chain((info_dict["cnt"], ), info_dict["flag_cnts"].values())):
+            largest = max(weights)
+            weights = [weight / largest for weight in weights] if largest else weights
+            for i, distribution in enumerate(distributions):
+                scales[i] = max(distribution.values(), default=0) or 1
+                distributions[i] = {mines: cnt / scales[i] for mines, cnt in distribution.items()}
+
+        # prefixes[i][t]: number of solutions of counters[:i] with t mines
+        prefixes = [[1] + [0] * max_mines]
+        for distribution in distributions:
+            prefixes.append(convolve(prefixes[-1], distribution, max_mines))
 
         # total and inland unseens probs
-        statistics = dp(counters)
-        total = 0
-        for mines, cnt in statistics.items():
-            if remains - len(inland_unseens) <= mines <= remains:
-                total += cnt * math.comb(len(inland_unseens), remains - mines)
+        total = sum(cnt * weight for cnt, weight in zip(prefixes[-1], weights))
         if total == 0:
             raise ValueError("No valid solution.")
 
-        inland_cnts = defaultdict(int)
-        for mines, cnt in statistics.items():
-            for inland_unseen in inland_unseens:
-                if mines < remains:
-                    inland_cnts[inland_unseen] += cnt * math.comb(len(inland_unseens) - 1, remains - mines - 1)
+        inland_prob, inland_probs = None, dict()
+        if n_inland > 0:
+            # C(n - 1, k - 1) = C(n, k) * k / n
+            inland_cnt = sum(cnt * weights[mines] * (remains - mines)
+                             for mines, cnt in enumerate(prefixes[-1]) if mines < remains)
+            inland_prob = inland_cnt / (n_inland * total)
+            if max_inland_probs is None or n_inland <= max_inland_probs:
+                inland_probs = dict.fromkeys(inland_unseens, inland_prob)
+
+        # suffix[t]: weighted number of ways to place mines in counters[i + 1:] and inland unseens, given t mines
+        # in counters[:i + 1]
+        suffix = weights
+        counters_cnts = [None] * len(counters)
+        for i in reversed(range(len(counters))):
+            prefix = prefixes[i]
+            around_cnts = defaultdict(int)
+            for mines, info_dict in counters[i].pseudo_contexts.items():
+                if mines > remains:
+                    continue
+                weight = sum(prefix[prev_mines] * suffix[prev_mines + mines]
+                             for prev_mines in range(max_mines - mines + 1) if prefix[prev_mines])
+                if weight == 0:
+                    continue
+                if scales[i] == 1:
+                    for unseen, flag_cnt in info_dict["flag_cnts"].items():
+                        around_cnts[unseen] += flag_cnt * weight
                 else:
-                    inland_cnts[inland_unseen] += 0
-        inland_probs = {inland_unseen: cnt / total for inland_unseen, cnt in inland_cnts.items()}
+                    for unseen, flag_cnt in info_dict["flag_cnts"].items():
+                        around_cnts[unseen] += flag_cnt / scales[i] * weight
+            counters_cnts[i] = around_cnts
+            suffix = [sum(cnt * suffix[prev_mines + mines] for mines, cnt in distributions[i].items()
+                          if prev_mines + mines <= max_mines)
+                      for prev_mines in range(max_mines + 1)]
 
         cnts = defaultdict(int)
-        for i, counter in enumerate(counters):
-            around_cnts = defaultdict(int)
-            statistics = dp(counters[:i] + counters[i + 1:])
-            for mines, info_dict in counter.pseudo_contexts.items():
-                cnt = info_dict["cnt"]
-                for prev_mines, prev_cnt in statistics.items():
-                    if remains - len(inland_unseens) <= mines + prev_mines <= remains:
-                        for unseen, flag_cnt in info_dict["flag_cnts"].items():
-                            around_cnts[unseen] += flag_cnt * prev_cnt * math.comb(len(inland_unseens), remains - mines - prev_mines)
+        for around_cnts in counters_cnts:
             assert set(cnts.keys()).isdisjoint(set(around_cnts.keys()))
             cnts.update(around_cnts)
 
@@ -145,4 +190,54 @@ class Counter(object):
                 hints.append(position)
             elif math.isclose(prob, 1.):
                 flags.append(position)
-        return {"probs": probs, "hints": hints, "flags": flags}
+        conclusion = {"probs": probs, "hints": hints, "flags": flags}
+        if inland_prob is not None and not inland_probs:
+            conclusion["inland_prob"] = inland_prob
+        return conclusion
+
+
+@lru_cache(maxsize=64)
+def binomials(n, k_max):
+    """
+    binomial coefficients C(n, k) for k in [0, k_max], zeros for k > n, reused among calls
+    """
+    row = [1] + [0] * k_max
+    for k in range(1, min(n, k_max) + 1):
+        row[k] = row[k - 1] * (n - k + 1) // k
+    return row
+
+
+def binomial_ratios(n, k, count):
+    """
+    binomial coefficients C(n, k - t) for t in [0, count) up to a common positive factor, built from products of
+    count - 1 factors by C(n, j - 1) = C(n, j) * j / (n - j + 1), thus C(n, k) itself is never computed for huge n and
+    k. The common factor is divided out by the gcd of the ratios, thus they are C(n, k - t) / g for the gcd g of these
+    binomial coefficients, at most C(n, k - t) themselves, i.e., integers of at most about log10(C(n, k)) digits.
+    """
+    prefix = [1]
+    for t in range(1, count):
+        prefix.append(prefix[-1] * (k - t + 1))
+    suffix = [1] * count
+    for t in reversed(range(count - 1)):
+        suffix[t] = suffix[t + 1] * (n - k + t + 1)
+    # zeros for k - t > n
+    ratios = [prefix[t] * suffix[t] if k - t <= n else 0 for t in range(count)]
+    divisor = math.gcd(*ratios)
+    return [ratio // divisor for ratio in ratios] if divisor > 1 else ratios
+
+
+def convolve(statistics, distribution, max_mines):
+    """
+    :param statistics: number of solutions with t mines at index t
+    :param distribution: mines -> number of solutions of another disjoint group
+    :param max_mines: max number of mines kept
+    :return: number of solutions of the union at index t
+    """
+    updated = [0] * (max_mines + 1)
+    for prev_mines, prev_cnt in enumerate(statistics):
+        if prev_cnt == 0:
+            continue
+        for mines, cnt in distribution.items():
+            if prev_mines + mines <= max_mines:
+                updated[prev_mines + mines] += prev_cnt * cnt
+    return updated
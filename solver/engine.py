@@ -6,15 +6,22 @@ import pdb
 
 import math
 import time
+import atexit
 from typing import Dict, Set
 import random
+import multiprocessing
 from collections import deque, defaultdict
 from minesweeper import board, interact
 from global_variables import *
 import itertools
 import utils
 from solver.counter import Counter
-from solver.attempt import Attempt
+from solver.attempt import Attempt, BitAttempt
+from solver.linear import solve_constraints
+from solver.sampler import SamplingEstimator
+from solver.equivalence import ClassSolver
+from solver.patterns import default_database
+from solver.stats import Stats
 
 
 class PseudoContext(object):
@@ -60,10 +67,240 @@ class PseudoContext(object):
             raise RuntimeError
 
 
+class BitPseudoContext(object):
+    """
+    Pseudo context of a group of incomplete hints for level 3 inference. Unseens around the group are indexed by
+    bits, thus pseudo flags and pseudo hints are bitmasks, and update, undo and validity checks are bitwise operations.
+    Hints of the group are indexed by their order in group.
+    """
+    def __init__(self, group, context):
+        hints, unseens, indexing = list(group), [], dict()
+        # unseens around each hint and remains of each hint
+        hint_masks, hint_remains = [], []
+        for h, w in hints:
+            around = utils.look_around(h, w, context)
+            mask = 0
+            for unseen in around["unseens"]:
+                if unseen not in indexing:
+                    indexing[unseen] = len(unseens)
+                    unseens.append(unseen)
+                mask |= 1 << indexing[unseen]
+            hint_masks.append(mask)
+            hint_remains.append(around["remains"])
+        self.build(hints, unseens, hint_masks, hint_remains)
+
+    def build(self, hints, unseens, hint_masks, hint_remains):
+        self.hints = hints
+        self.unseens = unseens
+        self.hint_masks = hint_masks
+        self.hint_remains = hint_remains
+        # hints sharing unseens with each hint, which must be checked after an attempt of the hint
+        self.related_hints = [[i for i, other in enumerate(self.hint_masks) if other & mask]
+                              for mask in self.hint_masks]
+
+        self.visited = 0
+        self.flag_mask = 0
+        self.hint_mask = 0
+        self.n_flags = 0
+        self.n_hints = 0
+
+    def state(self):
+        """
+        compact state of the group, which is enough to rebuild the pseudo context without context, e.g., in workers
+        """
+        return self.hints, self.unseens, self.hint_masks, self.hint_remains
+
+    @classmethod
+    def from_state(cls, hints, unseens, hint_masks, hint_remains):
+        pseudo_context = cls.__new__(cls)
+        pseudo_context.build(hints, unseens, hint_masks, hint_remains)
+        return pseudo_context
+
+    def key(self):
+        """
+        canonical key of the group, solutions of the group only depend on its hints, their remains and its unseens
+        """
+        return frozenset(zip(self.hints, self.hint_remains)), frozenset(self.unseens)
+
+    @property
+    def pseudo_flags(self):
+        return {self.unseens[bit.bit_length() - 1] for bit in utils.iter_bits(self.flag_mask)}
+
+    @property
+    def pseudo_hints(self):
+        return {self.unseens[bit.bit_length() - 1] for bit in utils.iter_bits(self.hint_mask)}
+
+    def update(self, attempt: BitAttempt):
+        assert not (self.flag_mask | self.hint_mask) & (attempt.flag_mask | attempt.hint_mask) and \
+               not self.visited >> attempt.hint & 1
+
+        self.visited |= 1 << attempt.hint
+        self.assign(attempt.flag_mask, attempt.hint_mask)
+
+    def undo(self, attempt: BitAttempt):
+        assert self.flag_mask & attempt.flag_mask == attempt.flag_mask and \
+               self.hint_mask & attempt.hint_mask == attempt.hint_mask and \
+               self.visited >> attempt.hint & 1
+
+        self.visited ^= 1 << attempt.hint
+        self.unassign(attempt.flag_mask, attempt.hint_mask)
+
+    def assign(self, flag_mask, hint_mask):
+        self.flag_mask |= flag_mask
+        self.hint_mask |= hint_mask
+        self.n_flags += utils.popcount(flag_mask)
+        self.n_hints += utils.popcount(hint_mask)
+
+    def unassign(self, flag_mask, hint_mask):
+        self.flag_mask ^= flag_mask
+        self.hint_mask ^= hint_mask
+        self.n_flags -= utils.popcount(flag_mask)
+        self.n_hints -= utils.popcount(hint_mask)
+
+    def propagate(self, hints):
+        """
+        forward checking: check hints and assign unseens forced by them, i.e., all unknown unseens around a hint are
+        pseudo hints if it needs no more mines and are pseudo flags if it needs all of them. Hints around forced
+        unseens are checked in turn.
+        :param hints: indices of hints to check
+        :return: (forced flag mask, forced hint mask), None if some hint cannot be satisfied (nothing is assigned)
+        """
+        forced_flags, forced_hints = 0, 0
+        queue = list(hints)
+        while queue:
+            i = queue.pop()
+            mask = self.hint_masks[i]
+            unknowns = mask & ~(self.flag_mask | self.hint_mask)
+            remains_around = self.hint_remains[i] - utils.popcount(mask & self.flag_mask)
+            n_unknowns = utils.popcount(unknowns)
+            if not 0 <= remains_around <= n_unknowns:
+                self.unassign(forced_flags, forced_hints)
+                return None
+            if n_unknowns == 0 or 0 < remains_around < n_unknowns:
+                continue
+            if remains_around == 0:
+                self.assign(0, unknowns)
+                forced_hints |= unknowns
+            else:
+                self.assign(unknowns, 0)
+                forced_flags |= unknowns
+            queue.extend(self.related_hints[i])
+        return forced_flags, forced_hints
+
+    def most_constrained_hint(self):
+        """
+        :return: index of the hint with the fewest attempts among hints with unknown unseens, None if all unseens are
+        assigned
+        """
+        assigned = self.flag_mask | self.hint_mask
+        best, best_n_attempts = None, None
+        for i, mask in enumerate(self.hint_masks):
+            unknowns = mask & ~assigned
+            if unknowns == 0:
+                continue
+            n_attempts = math.comb(utils.popcount(unknowns),
+                                   self.hint_remains[i] - utils.popcount(mask & self.flag_mask))
+            if best is None or n_attempts < best_n_attempts:
+                best, best_n_attempts = i, n_attempts
+                if n_attempts <= 1:
+                    break
+        return best
+
+    def iter_attempts(self, hint):
+        unknowns = self.hint_masks[hint] & ~(self.flag_mask | self.hint_mask)
+        if unknowns == 0:
+            return
+        num_mines = self.hint_remains[hint] - utils.popcount(self.hint_masks[hint] & self.flag_mask)
+
+        bits = list(utils.iter_bits(unknowns))
+        for flag_bits in itertools.combinations(bits, num_mines):
+            flag_mask = sum(flag_bits)
+            yield BitAttempt(hint, flag_mask, unknowns ^ flag_mask)
+
+    def is_valid_attempt(self, attempt: BitAttempt, context: interact.Context = None):
+        """
+        :param context: check number of remaining mines if context is given
+        """
+        if context is not None:
+            remains = context.front_side.remains
+            if self.n_flags > remains or len(context.front_side.unseens) - self.n_hints < remains:
+                return False
+        # only hints sharing unseens with the attempt are affected
+        assigned = self.flag_mask | self.hint_mask
+        for i in self.related_hints[attempt.hint]:
+            mask = self.hint_masks[i]
+            remains_around = self.hint_remains[i] - utils.popcount(mask & self.flag_mask)
+            if not 0 <= remains_around <= utils.popcount(mask & ~assigned):
+                return False
+        return True
+
+
+# persistent worker pools for level 3 inference, number of workers -> pool
+pools = dict()
+
+
+def get_pool(workers):
+    if workers not in pools:
+        pools[workers] = multiprocessing.Pool(workers)
+    return pools[workers]
+
+
+def close_pools():
+    for pool in pools.values():
+        pool.close()
+        pool.join()
+    pools.clear()
+
+
+# pools are shut down before interpreter teardown
+atexit.register(close_pools)
+
+
+def solve_group_state(state, threshold=None, search=LEVEL3_SEARCH):
+    """
+    count solutions of a group from its compact state, runs in workers
+    :param state: BitPseudoContext.state()
+    :param threshold: seconds allowed, no limit if None
+    :param search: "plain" for bit_dfs(), "fc" for fc_dfs() and "classes" for ClassSolver
+    :return: counter, None if time runs out
+    """
+    assert search in ["plain", "fc", "classes"]
+    terminate_func = utils.create_timer_function(time.time(), threshold) if threshold else None
+    if search == "classes":
+        return ClassSolver(*state).solve(terminate_func=terminate_func)
+
+    pseudo_context = BitPseudoContext.from_state(*state)
+    counter = Counter(mode="deep")
+    if search == "fc":
+        finished = Engine(None).fc_dfs(pseudo_context, counter, terminate_func=terminate_func)
+    else:
+        finished = Engine(None).bit_dfs(list(range(len(pseudo_context.hints))), None, pseudo_context, counter,
+                                        terminate_func=terminate_func)
+    return counter if finished else None
+
+
 class Engine(object):
-    def __init__(self, context, debug=False):
+    def __init__(self, context, debug=False, cache_size=LEVEL3_CACHE_SIZE, workers=LEVEL3_WORKERS,
+                 search=LEVEL3_SEARCH, patterns=PATTERN_DB, stats=ENGINE_STATS):
         self.context = context
         self.debug = debug
+        # instrumentation, True for a new Stats, a Stats instance (e.g., with a hook) or False for disabled
+        if stats is True:
+            stats = Stats()
+        self.stats = stats or None
+        # pattern database consulted before level 1, True for the database shared in process, False for disabled
+        if patterns is True:
+            patterns = default_database()
+        self.patterns = patterns if patterns is not False else None
+        # search mode of level 3 inference, "plain" for bit_dfs(), "fc" for fc_dfs() and "classes" for ClassSolver
+        self.search = search
+        # groups in level 3 inference are solved in a persistent pool with such number of workers, 0 for disabled.
+        # Daemonic processes (e.g., workers of simulate.py) cannot have children, thus groups are solved in process.
+        self.workers = workers if not multiprocessing.current_process().daemon else 0
+        # group key -> counter of solved groups in level 3 inference, reused among moves
+        self.counter_cache = utils.LRUCache(cache_size)
+        # buffer reused by look_around_into() in dfs
+        self.around = utils.Around()
 
     def what_next(self, mode="least"):
         """
@@ -71,39 +308,92 @@ class Engine(object):
         :return: ops
         """
         assert mode in ["least", "most"]
+        if self.stats is None:
+            return self.infer_next(mode)
+        self.stats.begin_move()
+        ops = self.infer_next(mode)
+        self.stats.end_move(ops)
+        return ops
+
+    def infer_next(self, mode):
         if len(self.context.front_side.hints) == 0:
-            return self.random_step()
+            return self.guess(None)
         ops = set()
 
+        # --------- inference with pattern database (5 x 5 window around each incomplete hint) ---------
+        if self.patterns is not None:
+            start, n_ops = time.perf_counter() if self.stats is not None else None, len(ops)
+            for hint_h, hint_w in utils.iter_incomplete_hints(self.context):
+                conclusion = self.patterns.lookup(hint_h, hint_w, self.context)
+                ops.update({interact.Operation(h, w, "step") for h, w in conclusion["hints"]})
+                ops.update({interact.Operation(h, w, "flag") for h, w in conclusion["flags"]})
+                if ops and mode == "least":
+                    break
+            self.record_stage("patterns", start, len(ops) > n_ops)
+            if ops:
+                return ops
+
         # --------- inference with level 1 (single hop) ---------
+        start, n_ops = time.perf_counter() if self.stats is not None else None, len(ops)
         for hint_h, hint_w in utils.iter_incomplete_hints(self.context):
             conclusion = self.inference(level=1, h=hint_h, w=hint_w)
             ops.update({interact.Operation(h, w, "step") for h, w in conclusion["hints"]})
             ops.update({interact.Operation(h, w, "flag") for h, w in conclusion["flags"]})
             if ops and mode == "least":
-                return ops
+                break
+        self.record_stage("level 1", start, len(ops) > n_ops)
+        if ops and mode == "least":
+            return ops
 
         # "most" mode or no solution in level 1
         # --------- inference with level 2 (double hop) ---------
+        start, n_ops = time.perf_counter() if self.stats is not None else None, len(ops)
         for hint_h, hint_w in utils.iter_incomplete_hints(self.context):
             conclusion = self.inference(level=2, h=hint_h, w=hint_w)
             ops.update({interact.Operation(h, w, "step") for h, w in conclusion["hints"]})
             ops.update({interact.Operation(h, w, "flag") for h, w in conclusion["flags"]})
             if ops and mode == "least":
-                return ops
-
-        if mode == "most" and ops:
+                break
+        self.record_stage("level 2", start, len(ops) > n_ops)
+        if ops:
             return ops
 
         # no solution in level 1 and level 2
+        # --------- inference with level 4 (linear algebra on constraints of incomplete hints) ---------
+        # polynomial time and tried before level 3
+        start, n_ops = time.perf_counter() if self.stats is not None else None, len(ops)
+        conclusion = self.inference(level=4)
+        ops.update({interact.Operation(h, w, "step") for h, w in conclusion["hints"]})
+        ops.update({interact.Operation(h, w, "flag") for h, w in conclusion["flags"]})
+        self.record_stage("level 4", start, len(ops) > n_ops)
+        if ops:
+            return ops
+
+        # no solution in level 1, level 2 and level 4
         # --------- inference with level 3 (global inference) ---------
+        start, n_ops = time.perf_counter() if self.stats is not None else None, len(ops)
         conclusion = self.inference(level=3)
         ops.update({interact.Operation(h, w, "step") for h, w in conclusion["hints"]})
         ops.update({interact.Operation(h, w, "flag") for h, w in conclusion["flags"]})
+        self.record_stage("level 3", start, len(ops) > n_ops)
         if ops:
             return ops
 
-        return self.let_me_guess_v1(conclusion["probs"])
+        return self.guess(conclusion["probs"], conclusion.get("inland_prob"))
+
+    def guess(self, probs, inland_prob=None):
+        """
+        random step if probs is None, else guess with probs
+        :param inland_prob: probability shared by inland unseens which are not listed in probs
+        """
+        start = time.perf_counter() if self.stats is not None else None
+        op = self.random_step() if probs is None else self.let_me_guess_v1(probs, inland_prob)
+        self.record_stage("guess", start, True)
+        return op
+
+    def record_stage(self, stage, start, hit):
+        if self.stats is not None:
+            self.stats.record_stage(stage, start, hit)
 
     def inference(
             self,
@@ -116,6 +406,7 @@ class Engine(object):
             level 1: inference with single point
             level 2: inference with single point and hints around
             level 3: global inference to get precise probability
+            level 4: inference with gaussian elimination and bounds of all incomplete hints, tried before level 3
         :param h: h
         :param w: w
         :return: probability table
@@ -128,6 +419,8 @@ class Engine(object):
             assert h is not None and w is not None
             first_hop = utils.look_around(h, w, self.context)
             for attempt in self.iter_attempts(h, w, first_hop):
+                # attempts around the hint are search nodes of level 1, and roots of dfs in level 2
+                counter.n_nodes += 1
                 pseudo_context.update(attempt)
                 if self.is_valid_attempt(self.context, pseudo_context):
                     if level == 1:
@@ -136,6 +429,8 @@ class Engine(object):
                         around_hints = list(
                             utils.iter_arounds(
                                 first_hop["unseens"],
+                                self.context.height,
+                                self.context.width,
                                 around_type="HINT",
                                 context=self.context,
                                 blocks={(h, w)},
@@ -143,21 +438,79 @@ class Engine(object):
                         )
                         self.dfs(around_hints, self.context, pseudo_context, counter)
                 pseudo_context.undo(attempt)
+            if self.stats is not None:
+                self.stats.record_nodes(f"level {level}", counter.n_nodes)
             conclusion = counter.conclude()
         elif level == 3:
             incomplete_hint_groups = self.group_incomplete_hints_into_disjoint_sets()
             counters = self.deep_inference(incomplete_hint_groups, force_dfs=False)
-            inland_unseens = list(utils.iter_inland_unseens(self.context))
+            inland_unseens = self.context.front_side.inland_unseens
             try:
-                conclusion = Counter.conclude_with_disjoint_counters(counters, inland_unseens, self.context.front_side.remains)
+                conclusion = Counter.conclude_with_disjoint_counters(counters, inland_unseens, self.context.front_side.remains,
+                                                                     max_inland_probs=INLAND_PROBS_MAX)
             except ValueError:
                 conclusion = {"probs": dict(), "flags": [], "hints": []}
                 # counters = self.deep_inference(incomplete_hint_groups, force_dfs=True)
                 # conclusion = Counter.conclude_with_disjoint_counters(counters, inland_unseens, self.context.front_side.remains)
+        elif level == 4:
+            conclusion = self.linear_inference()
         else:
             raise ValueError(f"Invalid level inference level: {level}, expect level in [1, 2, 3, 4].")
         return conclusion
 
+    def linear_inference(self):
+        """
+        Each incomplete hint gives an equation: sum of unseens around it = remains of it, where an unseen is 1 if it
+        is a mine else 0. Equations of each group are reduced by gaussian elimination, and then unseens are fixed by
+        bounds of equations. If nothing is fixed, equations of all groups are solved together with the number of
+        remaining mines, where inland unseens are counted by a single variable.
+        :return: conclusion with certain flags and hints only
+        """
+        conclusion = {"probs": dict(), "flags": [], "hints": []}
+        unseens, indexing, equations = [], dict(), []
+        for group in self.group_incomplete_hints_into_disjoint_sets():
+            group_equations = []
+            for h, w in group:
+                around = utils.look_around(h, w, self.context)
+                for unseen in around["unseens"]:
+                    if unseen not in indexing:
+                        indexing[unseen] = len(unseens)
+                        unseens.append(unseen)
+                group_equations.append(({indexing[unseen]: 1 for unseen in around["unseens"]}, around["remains"]))
+            equations.extend(group_equations)
+
+            values = solve_constraints(group_equations, [1] * len(unseens))
+            if values is None:
+                # inconsistent, leave it to level 3
+                return conclusion
+            self.conclude_linear_values(values, unseens, conclusion)
+
+        if conclusion["flags"] or conclusion["hints"]:
+            return conclusion
+
+        # the last variable counts mines in inland unseens, which are only listed if they are fixed and not too many
+        n_inland = len(self.context.front_side.inland_unseens)
+        equations.append(({**{i: 1 for i in range(len(unseens))}, len(unseens): 1}, self.context.front_side.remains))
+        values = solve_constraints(equations, [1] * len(unseens) + [n_inland])
+        if values is None:
+            return conclusion
+        inland_value = values.pop(len(unseens), None)
+        if inland_value is not None and n_inland <= INLAND_PROBS_MAX:
+            unseens.extend(utils.iter_inland_unseens(self.context))
+            values.update({i: inland_value and 1 for i in range(len(unseens) - n_inland, len(unseens))})
+        self.conclude_linear_values(values, unseens, conclusion)
+        return conclusion
+
+    @staticmethod
+    def conclude_linear_values(values, positions, conclusion):
+        for i, value in values.items():
+            conclusion["probs"][positions[i]] = float(value)
+            if value:
+                conclusion["flags"].append(positions[i])
+            else:
+                conclusion["hints"].append(positions[i])
+        return conclusion
+
     def dfs(
             self,
             hints,
@@ -167,13 +520,14 @@ class Engine(object):
             consider_remains=False,
             terminate_func=None,
     ):
+        counter.n_nodes += 1
         if len(hints) == 0:
             counter.update(pseudo_context, consider_remains, context)
             return True
 
         hint_h, hint_w = hints.pop()
 
-        around = utils.look_around(hint_h, hint_w, context, pseudo_context)
+        around = utils.look_around_into(hint_h, hint_w, context, self.around, pseudo_context)
         attempts = list(self.iter_attempts(hint_h, hint_w, around))
         if len(attempts) == 0:
             finished = self.dfs(hints, context, pseudo_context, counter, consider_remains, terminate_func)
@@ -196,13 +550,89 @@ class Engine(object):
         hints.append((hint_h, hint_w))
         return True
 
+    def bit_dfs(
+            self,
+            hints,
+            context: interact.Context,
+            pseudo_context: BitPseudoContext,
+            counter=None,
+            terminate_func=None,
+    ):
+        """
+        same as dfs() with BitPseudoContext
+        :param hints: indices of hints in pseudo_context to visit
+        :param context: if None, number of remaining mines is not considered and solutions only depend on the group
+        """
+        counter.n_nodes += 1
+        if len(hints) == 0:
+            counter.update(pseudo_context)
+            return True
+
+        hint = hints.pop()
+
+        attempts = list(pseudo_context.iter_attempts(hint))
+        if len(attempts) == 0:
+            finished = self.bit_dfs(hints, context, pseudo_context, counter, terminate_func)
+            hints.append(hint)
+            return finished
+
+        for attempt in attempts:
+            pseudo_context.update(attempt)
+            if pseudo_context.is_valid_attempt(attempt, context):
+                finished = self.bit_dfs(hints, context, pseudo_context, counter, terminate_func)
+                if not finished:
+                    pseudo_context.undo(attempt)
+                    return finished
+                elif terminate_func and terminate_func():
+                    pseudo_context.undo(attempt)
+                    hints.append(hint)
+                    return False
+            pseudo_context.undo(attempt)
+
+        hints.append(hint)
+        return True
+
+    def fc_dfs(self, pseudo_context: BitPseudoContext, counter=None, terminate_func=None, root=True):
+        """
+        dfs with forward checking: hint with the fewest attempts is visited first, and unseens forced by each attempt
+        are assigned at once, thus dead branches are cut before they are expanded.
+        """
+        counter.n_nodes += 1
+        forced = None
+        if root:
+            forced = pseudo_context.propagate(range(len(pseudo_context.hints)))
+            if forced is None:
+                return True
+
+        hint = pseudo_context.most_constrained_hint()
+        if hint is None:
+            counter.update(pseudo_context)
+            finished = True
+        else:
+            finished = True
+            for attempt in pseudo_context.iter_attempts(hint):
+                pseudo_context.update(attempt)
+                attempt_forced = pseudo_context.propagate(pseudo_context.related_hints[hint])
+                if attempt_forced is not None:
+                    finished = self.fc_dfs(pseudo_context, counter, terminate_func, root=False)
+                    pseudo_context.unassign(*attempt_forced)
+                pseudo_context.undo(attempt)
+                if not finished or (terminate_func and terminate_func()):
+                    finished = False
+                    break
+
+        if forced is not None:
+            pseudo_context.unassign(*forced)
+        return finished
+
     def is_valid_attempt(self, context: interact.Context, pseudo_context: PseudoContext):
         if len(pseudo_context.pseudo_flags) > context.front_side.remains or \
                 len(context.front_side.unseens) - len(pseudo_context.pseudo_hints) < context.front_side.remains:
             return False
         # iter hint positions which are affected by attempt(s)
         attempt_points = pseudo_context.pseudo_hints.union(pseudo_context.pseudo_flags)
-        for around_h, around_w in utils.iter_arounds(attempt_points, around_type="HINT", context=context):
+        for around_h, around_w in utils.iter_arounds(attempt_points, context.height, context.width,
+                                                     around_type="HINT", context=context):
             if not self.is_valid_hint(around_h, around_w, context, pseudo_context):
                 return False
         return True
@@ -216,8 +646,8 @@ class Engine(object):
         if (h, w) in pseudo_context.pseudo_hints:
             return True
         elif context.front_side.type(h, w) == "HINT":
-            around = utils.look_around(h, w, context, pseudo_context)
-            return 0 <= around["remains"] <= len(around["unseens"])
+            n_flags, n_unseens, _ = utils.count_around(h, w, context, pseudo_context)
+            return 0 <= context.front_side.get(h, w) - n_flags <= n_unseens
         else:
             raise RuntimeError
 
@@ -229,17 +659,21 @@ class Engine(object):
             return interact.Operation(0, 0, "step")
 
     def random_step(self):
-        h, w = random.choice(list(self.context.front_side.unseens))
-        self.hold_on(f"Random Step: {(h, w)}")
+        h, w = utils.random_position(self.context.front_side.unseens)
+        if self.debug:
+            self.hold_on(f"Random Step: {(h, w)}")
         return interact.Operation(h, w, "step")
 
     @staticmethod
     def iter_attempts(h, w, around):
-        unseens, num_mines = around["unseens"], around["remains"]
+        if isinstance(around, utils.Around):
+            unseens, num_mines = around.unseens[:around.n_unseens], around.remains
+        else:
+            unseens, num_mines = around["unseens"], around["remains"]
         if len(unseens) == 0:
             return
 
-        for flag_indices in itertools.combinations(list(range(len(around["unseens"]))), num_mines):
+        for flag_indices in itertools.combinations(list(range(len(unseens))), num_mines):
             flag_indices = set(flag_indices)
             pseudo_flags, pseudo_hints = set(), set()
             for i in range(len(unseens)):
@@ -277,18 +711,25 @@ class Engine(object):
             indexing = {incomplete_hint: groups[uf.find(incomplete_hint)] for incomplete_hint in incomplete_hints}
             return list(groups.values()), indexing
 
-    def let_me_guess_v1(self, probs: Dict):
-        if not probs:
+    def let_me_guess_v1(self, probs: Dict, inland_prob=None):
+        """
+        :param inland_prob: probability shared by inland unseens which are not listed in probs, and then one of them
+               is taken as a candidate (see pick_inland_unseen())
+        """
+        if not probs and inland_prob is None:
             return self.random_step()
 
         # only step, no flag
-        # 1. sort by probs
-        sorted_probs = sorted(list(probs.items()), key=lambda pos_prob: pos_prob[1])
-        min_prob_positions = []
-        min_prob = sorted_probs[0][1]
-        for position, prob in sorted_probs:
-            if math.isclose(prob, min_prob):
-                min_prob_positions.append(position)
+        # 1. positions with min prob, sorted by probs (only close ones are sorted, probs of inland unseens could be
+        # many on large boards)
+        min_prob = min(probs.values(), default=inland_prob)
+        if inland_prob is not None and inland_prob < min_prob and not math.isclose(inland_prob, min_prob):
+            min_prob = inland_prob
+        close_probs = sorted([(position, prob) for position, prob in probs.items() if math.isclose(prob, min_prob)],
+                             key=lambda pos_prob: pos_prob[1])
+        min_prob_positions = [position for position, _ in close_probs]
+        if inland_prob is not None and math.isclose(inland_prob, min_prob):
+            min_prob_positions.append(self.pick_inland_unseen())
 
         # 2. sort by number of unseen tiles around, less is better
         min_prob_positions = sorted(
@@ -301,6 +742,18 @@ class Engine(object):
             self.hold_on(f"Min prob position {(h, w)}: {min_prob}")
         return interact.Operation(h, w, "step")
 
+    def pick_inland_unseen(self):
+        """
+        an inland unseen with the fewest unseens around without listing inland unseens, i.e., a corner if any of
+        them is inland, otherwise a random one
+        """
+        inland_unseens = self.context.front_side.inland_unseens
+        height, width = self.context.height, self.context.width
+        for corner in [(0, 0), (0, width - 1), (height - 1, 0), (height - 1, width - 1)]:
+            if corner in inland_unseens:
+                return corner
+        return utils.random_position(inland_unseens)
+
     def let_me_guess_v2(self, probs: Dict):
         # only step, no flag
         if not probs:
@@ -388,35 +841,71 @@ class Engine(object):
             pdb.set_trace()
 
     def deep_inference(self, incomplete_hint_groups, force_dfs=False):
-        counters = []
-        for group in incomplete_hint_groups:
-            if force_dfs:
-                counter = Counter(mode="deep")
-                pseudo_context = PseudoContext()
-                self.dfs(list(group), self.context, pseudo_context, counter)
-            else:
-                counter = Counter(mode="deep")
-                pseudo_context = PseudoContext()
-                start = time.time()
-                finished = self.dfs(list(group), self.context, pseudo_context, counter,
-                                    terminate_func=utils.create_timer_function(time.time(), LEVEL3_THRESHOLD))
-                if not finished:
-                    # simple estimate
-                    counter = Counter(mode="deep")
-                    pseudo_context = PseudoContext()
-                    self.dfs(list(group), self.context, pseudo_context, counter, terminate_func=lambda: counter.cnt >= 1)
-                    n_mines_around = min(counter.pseudo_contexts.keys())
-                    around_unseens = list(utils.iter_arounds(group, around_type=UNSEEN, context=self.context))
-                    counter.pseudo_contexts = {
-                        n_mines_around: {
-                            "flag_cnts": {pos: n_mines_around / len(around_unseens) for pos in around_unseens},
-                            "cnt": 1
-                        }
-                    }
-                    counter.cnt = 1
+        """
+        Solutions of each group are counted without the number of remaining mines, which is considered in
+        Counter.conclude_with_disjoint_counters(), thus counters of unchanged groups are reused among moves.
+        If workers are enabled, groups with at least LEVEL3_PARALLEL_MIN_UNSEENS unseens are solved in the pool.
+        """
+        threshold = None if force_dfs else LEVEL3_THRESHOLD
+        pool = get_pool(self.workers) if self.workers else None
+
+        counters, pending = [], dict()
+        for i, group in enumerate(incomplete_hint_groups):
+            pseudo_context = BitPseudoContext(group, self.context)
+            key = pseudo_context.key()
+            counter = self.counter_cache.get(key)
+            if counter is not None and self.stats is not None:
+                self.stats.record_group(len(pseudo_context.unseens), cached=True)
+            if counter is None and pool and len(pseudo_context.unseens) >= LEVEL3_PARALLEL_MIN_UNSEENS:
+                pending[i] = (group, key, pool.apply_async(solve_group_state,
+                                                                (pseudo_context.state(), threshold, self.search)))
+            elif counter is None:
+                counter = solve_group_state(pseudo_context.state(), threshold, self.search)
+                counter = self.cache_or_estimate(group, key, counter)
             counters.append(counter)
+
+        for i, (group, key, result) in pending.items():
+            counters[i] = self.cache_or_estimate(group, key, result.get())
         return counters
 
+    def cache_or_estimate(self, group, key, counter):
+        """
+        cache counter of a solved group, or estimate the group by sampling if time ran out (counter is None)
+        """
+        if self.stats is not None:
+            self.stats.record_group(len(key[1]), timeout=counter is None)
+            if counter is not None:
+                self.stats.record_nodes("level 3", counter.n_nodes)
+        if counter is not None:
+            self.counter_cache.put(key, counter)
+            return counter
+
+        # estimate with sampling, estimates are not cached
+        if self.stats is not None:
+            self.stats.record_estimate()
+        estimator = SamplingEstimator(BitPseudoContext(group, self.context))
+        for estimate in estimator.iter_estimates(LEVEL3_SAMPLING_TIME):
+            pass
+        counter = estimator.counter()
+        if counter is not None:
+            return counter
+
+        # simple estimate
+        counter = Counter(mode="deep")
+        pseudo_context = BitPseudoContext(group, self.context)
+        self.bit_dfs(list(range(len(pseudo_context.hints))), self.context, pseudo_context, counter,
+                     terminate_func=lambda: counter.cnt >= 1)
+        n_mines_around = min(counter.pseudo_contexts.keys())
+        around_unseens = pseudo_context.unseens
+        counter.pseudo_contexts = {
+            n_mines_around: {
+                "flag_cnts": {pos: n_mines_around / len(around_unseens) for pos in around_unseens},
+                "cnt": 1
+            }
+        }
+        counter.cnt = 1
+        return counter
+
     def num_clear_tiles_if_hw_is_safe(self, h, w):
         pseudo_context = PseudoContext()
         pseudo_context.pseudo_hints.add((h, w))
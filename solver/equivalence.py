@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/18 15:02
+# Author  : Yichen Lu
+
+from collections import defaultdict, deque
+
+from solver.counter import Counter, binomials
+
+
+def collapse(n_unseens, hint_masks):
+    """
+    group unseens by hints around them, unseens in the same class are interchangeable in constraints of hints
+    :param n_unseens: number of unseens
+    :param hint_masks: masks of unseens around each hint
+    :return: classes (list of indices of unseens), hint indices around each class
+    """
+    signatures = defaultdict(list)
+    for i in range(n_unseens):
+        signature = tuple(j for j, mask in enumerate(hint_masks) if mask >> i & 1)
+        signatures[signature].append(i)
+    return list(signatures.values()), list(signatures.keys())
+
+
+class ClassSolver(object):
+    """
+    Count solutions of a group of incomplete hints over numbers of mines in classes of unseens (see collapse()), where
+    a class of size n with k mines stands for C(n, k) solutions. Thus a class of n unseens is a single variable of
+    n + 1 values instead of n binary variables.
+    """
+    def __init__(self, hints, unseens, hint_masks, hint_remains):
+        self.unseens = unseens
+        self.hint_remains = hint_remains
+        self.classes, self.class_hints = collapse(len(unseens), hint_masks)
+        self.sizes = [len(unseen_indices) for unseen_indices in self.classes]
+        self.hint_classes = [[] for _ in hints]
+        for c, class_hints in enumerate(self.class_hints):
+            for j in class_hints:
+                self.hint_classes[j].append(c)
+        self.order = self.order_classes()
+
+        # of each hint: number of mines in assigned classes, number of unseens in unassigned classes
+        self.assigned_mines = [0] * len(hints)
+        self.capacities = [sum(self.sizes[c] for c in classes) for classes in self.hint_classes]
+        self.values = [0] * len(self.classes)
+
+        # mines -> number of solutions, mines -> number of mines in each class summed over solutions
+        self.cnts = defaultdict(int)
+        self.class_flag_cnts = dict()
+        self.n_nodes = 0
+
+    def order_classes(self):
+        """
+        classes in bfs order of hints, thus hints are completed as early as possible
+        """
+        order, ordered, visited = [], set(), set()
+        for start in range(len(self.hint_classes)):
+            if start in visited:
+                continue
+            visited.add(start)
+            queue = deque([start])
+            while queue:
+                j = queue.popleft()
+                for c in self.hint_classes[j]:
+                    if c in ordered:
+                        continue
+                    ordered.add(c)
+                    order.append(c)
+                    for other in self.class_hints[c]:
+                        if other not in visited:
+                            visited.add(other)
+                            queue.append(other)
+        return order
+
+    def value_range(self, c):
+        """
+        bounds of number of mines in class c given by hints around it
+        """
+        size = self.sizes[c]
+        low, high = 0, size
+        for j in self.class_hints[c]:
+            needed = self.hint_remains[j] - self.assigned_mines[j]
+            high = min(high, needed)
+            low = max(low, needed - (self.capacities[j] - size))
+        return low, high
+
+    def dfs(self, depth=0, mines=0, weight=1, terminate_func=None):
+        self.n_nodes += 1
+        if depth == len(self.order):
+            self.record(mines, weight)
+            return True
+
+        c = self.order[depth]
+        size = self.sizes[c]
+        low, high = self.value_range(c)
+        if low > high:
+            return True
+
+        binomial = binomials(size, size)
+        for j in self.class_hints[c]:
+            self.capacities[j] -= size
+        finished = True
+        for value in range(low, high + 1):
+            self.values[c] = value
+            for j in self.class_hints[c]:
+                self.assigned_mines[j] += value
+            finished = self.dfs(depth + 1, mines + value, weight * binomial[value], terminate_func)
+            for j in self.class_hints[c]:
+                self.assigned_mines[j] -= value
+            # checked after each child, thus subtrees of dead ends (low > high) are bounded by time as well
+            if not finished or (terminate_func and terminate_func()):
+                finished = False
+                break
+        for j in self.class_hints[c]:
+            self.capacities[j] += size
+        return finished
+
+    def record(self, mines, weight):
+        self.cnts[mines] += weight
+        if mines not in self.class_flag_cnts:
+            self.class_flag_cnts[mines] = [0] * len(self.classes)
+        class_flag_cnts = self.class_flag_cnts[mines]
+        for c, value in enumerate(self.values):
+            if value:
+                class_flag_cnts[c] += weight * value
+
+    def solve(self, terminate_func=None):
+        """
+        :return: counter in "deep" mode same as the one given by dfs over unseens, None if time runs out
+        """
+        if not self.dfs(terminate_func=terminate_func):
+            return None
+
+        counter = Counter(mode="deep")
+        counter.cnt = sum(self.cnts.values())
+        counter.n_nodes = self.n_nodes
+        for mines, cnt in self.cnts.items():
+            flag_cnts = dict()
+            for c, unseen_indices in enumerate(self.classes):
+                # each unseen of class c is a flag in (number of mines in c) / (size of c) of solutions
+                flag_cnt = self.class_flag_cnts[mines][c] // self.sizes[c]
+                for i in unseen_indices:
+                    flag_cnts[self.unseens[i]] = flag_cnt
+            counter.pseudo_contexts[mines] = {"flag_cnts": flag_cnts, "cnt": cnt}
+        return counter
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/18 11:05
+# Author  : Yichen Lu
+
+import math
+
+
+def normalize_row(row):
+    """
+    divide row by gcd of its items and make its first non-zero coefficient positive
+    """
+    divisor = 0
+    for item in row:
+        divisor = math.gcd(divisor, item)
+    if divisor > 1:
+        row = [item // divisor for item in row]
+    for item in row[:-1]:
+        if item != 0:
+            return row if item > 0 else [-item for item in row]
+    return row
+
+
+def eliminate(rows, n_variables):
+    """
+    integer (fraction-free) gaussian elimination into reduced row echelon form
+    :param rows: equations, coefficients of variables followed by constant, i.e., [a_0, ..., a_n-1, b]
+    :param n_variables: number of variables
+    :return: non-zero reduced rows, None if equations are inconsistent
+    """
+    rows = [list(row) for row in rows]
+    pivot_row = 0
+    for col in range(n_variables):
+        for r in range(pivot_row, len(rows)):
+            if rows[r][col] != 0:
+                rows[pivot_row], rows[r] = rows[r], rows[pivot_row]
+                break
+        else:
+            continue
+
+        pivot = rows[pivot_row]
+        for r in range(len(rows)):
+            factor = rows[r][col]
+            if r != pivot_row and factor != 0:
+                rows[r] = normalize_row([pivot[col] * a - factor * b for a, b in zip(rows[r], pivot)])
+        pivot_row += 1
+        if pivot_row == len(rows):
+            break
+
+    reduced = []
+    for row in rows:
+        if any(row[:-1]):
+            reduced.append(row)
+        elif row[-1] != 0:
+            return None
+    return reduced
+
+
+def propagate_bounds(rows, upper_bounds):
+    """
+    fix variables by bounds of equations, i.e., if constant of an equation reaches the minimum (maximum) of its left
+    side, variables with positive coefficients must be at their lower (upper) bounds and vice versa.
+    :param rows: equations, [a_0, ..., a_n-1, b]
+    :param upper_bounds: upper bounds of variables, lower bounds are 0
+    :return: variable index -> value, None if equations are inconsistent
+    """
+    values = dict()
+    changed = True
+    while changed:
+        changed = False
+        for row in rows:
+            constant, lowest, highest = row[-1], 0, 0
+            unknowns = []
+            for i, coefficient in enumerate(row[:-1]):
+                if coefficient == 0:
+                    continue
+                if i in values:
+                    constant -= coefficient * values[i]
+                elif coefficient > 0:
+                    highest += coefficient * upper_bounds[i]
+                    unknowns.append(i)
+                else:
+                    lowest += coefficient * upper_bounds[i]
+                    unknowns.append(i)
+
+            if not lowest <= constant <= highest:
+                return None
+            if not unknowns or lowest < constant < highest:
+                continue
+            for i in unknowns:
+                at_upper = (row[i] > 0) == (constant == highest)
+                values[i] = upper_bounds[i] if at_upper else 0
+            changed = True
+    return values
+
+
+def solve_constraints(equations, upper_bounds):
+    """
+    find forced values of variables of the equation system
+    :param equations: list of (coefficients dict: variable index -> coefficient, constant)
+    :param upper_bounds: upper bounds of variables, lower bounds are 0
+    :return: variable index -> value, None if equations are inconsistent
+    """
+    n_variables = len(upper_bounds)
+    rows = []
+    for coefficients, constant in equations:
+        row = [0] * (n_variables + 1)
+        for i, coefficient in coefficients.items():
+            row[i] = coefficient
+        row[-1] = constant
+        rows.append(row)
+
+    reduced = eliminate(rows, n_variables)
+    if reduced is None:
+        return None
+    # reduced rows carry combined information and original rows carry the tightest bounds
+    return propagate_bounds(reduced + rows, upper_bounds)
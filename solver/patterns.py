@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/18 16:10
+# Author  : Yichen Lu
+
+import struct
+import random
+import argparse
+from pathlib import Path
+
+import utils
+from global_variables import *
+from solver.equivalence import ClassSolver
+
+SIZE = 5
+RADIUS = SIZE // 2
+# codes in keys of patterns, hints in the center 3 x 3 are coded by their remains (0-8)
+KEY_UNSEEN, KEY_OTHER = 9, 10
+
+MAGIC = b"MSPD"
+VERSION = 1
+HEADER = struct.Struct("<4sBBI")
+RECORD = struct.Struct(f"<{SIZE * SIZE}sII")
+
+
+def transforms():
+    """
+    permutations of window indices under rotations and reflections
+    :return: 8 permutations, permutation[i] is the index of window index i after transform
+    """
+    def transform(r, c, t):
+        for _ in range(t % 4):
+            r, c = c, SIZE - 1 - r
+        return (r, SIZE - 1 - c) if t >= 4 else (r, c)
+
+    return [[row * SIZE + col for row, col in (transform(i // SIZE, i % SIZE, t) for i in range(SIZE * SIZE))]
+            for t in range(8)]
+
+
+TRANSFORMS = transforms()
+
+
+def transform_key(key, permutation):
+    transformed = bytearray(len(key))
+    for i, code in enumerate(key):
+        transformed[permutation[i]] = code
+    return bytes(transformed)
+
+
+def transform_mask(mask, permutation):
+    transformed = 0
+    for bit in utils.iter_bits(mask):
+        transformed |= 1 << permutation[bit.bit_length() - 1]
+    return transformed
+
+
+class PatternDatabase(object):
+    """
+    Lookup table from 5 x 5 windows around incomplete hints to unseens forced to be safe or mines by the hints in the
+    center 3 x 3 of the window, whose tiles around are all in the window. Thus the conclusion of a pattern is sound
+    whatever the board outside the window is.
+    A window is keyed by remains of hints in the center 3 x 3, unseens, and other tiles (flags, tiles outside the
+    board and hints in the border which do not constrain the window). Patterns are solved on their first lookup and
+    stored with all 8 rotations and reflections, and only canonical patterns are saved to disk in fixed size records.
+    """
+    def __init__(self):
+        # key -> (safe mask, mine mask) over window indices
+        self.patterns = dict()
+        self.canonical_keys = set()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.canonical_keys)
+
+    def key(self, h, w, context):
+        front_side = context.front_side
+        height, width, codes = front_side.height, front_side.width, front_side.codes
+        indices_around = utils.neighbor_indices(height, width)
+        key = bytearray(SIZE * SIZE)
+        for i in range(SIZE * SIZE):
+            r, c = i // SIZE - RADIUS + h, i % SIZE - RADIUS + w
+            if not (0 <= r < height and 0 <= c < width):
+                key[i] = KEY_OTHER
+                continue
+            code = codes[r * width + c]
+            if code == UNSEEN_CODE:
+                key[i] = KEY_UNSEEN
+            elif code <= 8 and abs(r - h) <= 1 and abs(c - w) <= 1:
+                key[i] = code - sum(codes[around_index] == FLAG_CODE for around_index in indices_around[r * width + c])
+                if not 0 <= key[i] <= 8:
+                    # inconsistent board
+                    return None
+            else:
+                key[i] = KEY_OTHER
+        return bytes(key)
+
+    @staticmethod
+    def solve(key):
+        """
+        :return: (safe mask, mine mask) over window indices
+        """
+        hints, unseens, indexing, hint_masks, hint_remains = [], [], dict(), [], []
+        for i, code in enumerate(key):
+            r, c = divmod(i, SIZE)
+            if code > 8 or abs(r - RADIUS) > 1 or abs(c - RADIUS) > 1:
+                continue
+            mask = 0
+            for bias_h, bias_w in utils.biases:
+                around = (r + bias_h) * SIZE + c + bias_w
+                if key[around] == KEY_UNSEEN:
+                    if around not in indexing:
+                        indexing[around] = len(unseens)
+                        unseens.append(around)
+                    mask |= 1 << indexing[around]
+            if mask:
+                hints.append(i)
+                hint_masks.append(mask)
+                hint_remains.append(code)
+        if not hints:
+            return 0, 0
+
+        counter = ClassSolver(hints, unseens, hint_masks, hint_remains).solve()
+        if counter is None or counter.cnt == 0:
+            return 0, 0
+        safe_mask, mine_mask = 0, 0
+        for i, unseen in enumerate(unseens):
+            flag_cnt = sum(info_dict["flag_cnts"][unseen] for info_dict in counter.pseudo_contexts.values())
+            if flag_cnt == 0:
+                safe_mask |= 1 << unseen
+            elif flag_cnt == counter.cnt:
+                mine_mask |= 1 << unseen
+        return safe_mask, mine_mask
+
+    def add(self, key, safe_mask, mine_mask):
+        """
+        add a pattern with all its rotations and reflections
+        """
+        transformed_keys = []
+        for permutation in TRANSFORMS:
+            transformed_key = transform_key(key, permutation)
+            self.patterns[transformed_key] = (transform_mask(safe_mask, permutation),
+                                              transform_mask(mine_mask, permutation))
+            transformed_keys.append(transformed_key)
+        self.canonical_keys.add(min(transformed_keys))
+
+    def lookup(self, h, w, context):
+        """
+        :return: conclusion with certain flags and hints only
+        """
+        conclusion = {"probs": dict(), "flags": [], "hints": []}
+        key = self.key(h, w, context)
+        if key is None:
+            return conclusion
+
+        masks = self.patterns.get(key)
+        if masks is None:
+            self.misses += 1
+            masks = self.solve(key)
+            self.add(key, *masks)
+        else:
+            self.hits += 1
+
+        for name, mask, prob in [("hints", masks[0], 0.), ("flags", masks[1], 1.)]:
+            for bit in utils.iter_bits(mask):
+                i = bit.bit_length() - 1
+                position = (h + i // SIZE - RADIUS, w + i % SIZE - RADIUS)
+                conclusion[name].append(position)
+                conclusion["probs"][position] = prob
+        return conclusion
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, SIZE, len(self.canonical_keys)))
+            for key in sorted(self.canonical_keys):
+                file.write(RECORD.pack(key, *self.patterns[key]))
+
+    def load(self, path):
+        data = Path(path).read_bytes()
+        magic, version, size, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or size != SIZE:
+            raise ValueError(f"Invalid pattern database: {path}.")
+        for key, safe_mask, mine_mask in RECORD.iter_unpack(data[HEADER.size: HEADER.size + count * RECORD.size]):
+            self.add(key, safe_mask, mine_mask)
+        return self
+
+
+# database shared by engines in the same process
+database = None
+
+
+def default_database():
+    global database
+    if database is None:
+        database = PatternDatabase()
+        if PATTERN_DB_PATH and Path(PATTERN_DB_PATH).exists():
+            database.load(PATTERN_DB_PATH)
+    return database
+
+
+def build(games, seed=0, path=PATTERN_DB_PATH):
+    """
+    collect patterns met in simulated games and save them
+    """
+    import minesweeper
+    from solver.engine import Engine
+
+    patterns = default_database()
+    rng = random.Random(seed)
+    for i in range(games):
+        random.seed(rng.getrandbits(64))
+        context = minesweeper.initialize(Engine.first_step())
+        context.is_draw = False
+        engine = Engine(context, patterns=patterns)
+        while not context.is_over and not context.is_win:
+            # patterns are looked up and learned in what_next()
+            context.interact(engine.what_next(mode="most"))
+        print(f"GAMES: {i + 1}/{games}, PATTERNS: {len(patterns)}", end="\r")
+    print()
+    patterns.save(path)
+    print(f"Save {len(patterns)} patterns to {path}.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build pattern database from simulated games.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=PATTERN_DB_PATH)
+    args = parser.parse_args()
+    build(args.games, args.seed, args.output)
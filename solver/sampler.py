@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/18 14:20
+# Author  : Yichen Lu
+
+import math
+import time
+import random
+from collections import defaultdict
+
+import utils
+from solver.counter import Counter
+
+
+class SamplingEstimator(object):
+    """
+    Anytime estimator of solutions of a group of incomplete hints, used when dfs runs out of time.
+    Each sample walks down the forward checking search tree of a BitPseudoContext, takes a random valid attempt at
+    each hint and is weighted by the product of numbers of valid attempts (sequential importance sampling), thus the
+    mean weight is an unbiased estimate of the number of solutions, and works like an exact counter in
+    Counter.conclude_with_disjoint_counters().
+    """
+    def __init__(self, pseudo_context, seed=0):
+        self.pseudo_context = pseudo_context
+        self.rng = random.Random(seed)
+        n_unseens = len(pseudo_context.unseens)
+
+        self.n_samples = 0
+        # mines -> sum of weights, mines -> sum of weights of samples where each unseen is a flag
+        self.weights = defaultdict(float)
+        self.flag_weights = defaultdict(lambda: [0.] * n_unseens)
+        # sums for confidence bounds of probability of each unseen
+        self.total_weight = 0.
+        self.total_squared_weight = 0.
+        self.unseen_weights = [0.] * n_unseens
+        self.unseen_squared_weights = [0.] * n_unseens
+
+    def valid_attempts(self, hint):
+        pseudo_context = self.pseudo_context
+        attempts = []
+        for attempt in pseudo_context.iter_attempts(hint):
+            pseudo_context.update(attempt)
+            forced = pseudo_context.propagate(pseudo_context.related_hints[hint])
+            if forced is not None:
+                attempts.append(attempt)
+                pseudo_context.unassign(*forced)
+            pseudo_context.undo(attempt)
+        return attempts
+
+    def sample(self):
+        """
+        draw a sample and record it
+        :return: weight of the sample, 0 if it runs into a dead end
+        """
+        pseudo_context = self.pseudo_context
+        weight, applied = 1., []
+        root_forced = pseudo_context.propagate(range(len(pseudo_context.hints)))
+        if root_forced is None:
+            self.n_samples += 1
+            return 0.
+
+        while True:
+            hint = pseudo_context.most_constrained_hint()
+            if hint is None:
+                self.record(pseudo_context.flag_mask, weight)
+                break
+            attempts = self.valid_attempts(hint)
+            if not attempts:
+                weight = 0.
+                break
+            attempt = self.rng.choice(attempts)
+            pseudo_context.update(attempt)
+            applied.append((attempt, pseudo_context.propagate(pseudo_context.related_hints[hint])))
+            weight *= len(attempts)
+
+        for attempt, forced in reversed(applied):
+            pseudo_context.unassign(*forced)
+            pseudo_context.undo(attempt)
+        pseudo_context.unassign(*root_forced)
+        self.n_samples += 1
+        return weight
+
+    def record(self, flag_mask, weight):
+        mines = utils.popcount(flag_mask)
+        self.weights[mines] += weight
+        self.total_weight += weight
+        self.total_squared_weight += weight * weight
+        flag_weights = self.flag_weights[mines]
+        for bit in utils.iter_bits(flag_mask):
+            i = bit.bit_length() - 1
+            flag_weights[i] += weight
+            self.unseen_weights[i] += weight
+            self.unseen_squared_weights[i] += weight * weight
+
+    def estimate(self, z=1.96):
+        """
+        :param z: z-score of confidence bounds, 1.96 for 95%
+        :return: {"samples": number of samples, "probs": unseen -> prob in group,
+                  "bounds": unseen -> half width of confidence interval}, None if no valid sample
+        """
+        if self.total_weight == 0:
+            return None
+        probs, bounds = dict(), dict()
+        for i, unseen in enumerate(self.pseudo_context.unseens):
+            prob = self.unseen_weights[i] / self.total_weight
+            # variance of ratio estimator, sum of (w * (x - p)) ^ 2 / (sum of w) ^ 2
+            variance = (self.unseen_squared_weights[i] * (1. - 2. * prob) +
+                        prob * prob * self.total_squared_weight) / (self.total_weight ** 2)
+            probs[unseen] = prob
+            bounds[unseen] = z * math.sqrt(max(variance, 0.))
+        return {"samples": self.n_samples, "probs": probs, "bounds": bounds}
+
+    def iter_estimates(self, budget, every=0.05):
+        """
+        sample until time runs out and yield improving estimates
+        :param budget: seconds allowed
+        :param every: seconds between two estimates
+        """
+        timer = utils.create_timer_function(time.time(), budget)
+        report = utils.create_timer_function(time.time(), every)
+        while not timer():
+            self.sample()
+            if report():
+                report = utils.create_timer_function(time.time(), every)
+                estimate = self.estimate()
+                if estimate is not None:
+                    yield estimate
+        estimate = self.estimate()
+        if estimate is not None:
+            yield estimate
+
+    def counter(self):
+        """
+        :return: counter in "deep" mode with estimated numbers of solutions, None if no valid sample
+        """
+        if self.total_weight == 0:
+            return None
+        counter = Counter(mode="deep")
+        counter.cnt = self.n_samples
+        unseens = self.pseudo_context.unseens
+        for mines, weight in self.weights.items():
+            if weight == 0:
+                continue
+            counter.pseudo_contexts[mines] = {
+                "flag_cnts": {unseen: flag_weight / self.n_samples
+                              for unseen, flag_weight in zip(unseens, self.flag_weights[mines])},
+                "cnt": weight / self.n_samples,
+            }
+        return counter
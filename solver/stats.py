@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/18 20:30
+# Author  : Yichen Lu
+
+import json
+import time
+from collections import defaultdict
+
+# stages of Engine.what_next() in order
+STAGES = ["patterns", "level 1", "level 2", "level 4", "level 3", "guess"]
+
+
+class Stats(object):
+    """
+    Instrumentation of an Engine: calls, hits and wall time of each stage of what_next(), search nodes, sizes of
+    groups (number of unseens) in level 3 inference, cache hits and timeouts.
+    Engines without stats keep it None and skip every record and clock read of stages. Search nodes are still counted
+    by counters (an integer increment per node), thus instrumentation costs almost nothing when disabled.
+    """
+    def __init__(self, hook=None):
+        """
+        :param hook: function called with the event of each move, see end_move()
+        """
+        self.hook = hook
+        self.moves = 0
+        self.time = 0.
+        # stage -> {"calls": ..., "hits": ..., "time": ...}
+        self.stages = {stage: {"calls": 0, "hits": 0, "time": 0.} for stage in STAGES}
+        # stage -> search nodes
+        self.nodes = defaultdict(int)
+        self.group_sizes = []
+        self.cache_hits = 0
+        self.timeouts = 0
+        self.estimates = 0
+
+        self.event = None
+        self.move_start = None
+
+    def begin_move(self):
+        self.event = {"move": self.moves, "stages": dict(), "nodes": 0, "group_sizes": [], "timeouts": 0}
+        self.move_start = time.perf_counter()
+
+    def end_move(self, ops):
+        """
+        :return: event of the move: {"move": index, "stages": stage -> {"hit": ..., "time": ...}, "nodes": ...,
+                 "group_sizes": [...], "timeouts": ..., "ops": number of ops, "time": seconds}
+        """
+        elapsed = time.perf_counter() - self.move_start
+        self.moves += 1
+        self.time += elapsed
+        event = self.event
+        event["ops"] = len(ops) if isinstance(ops, (set, list, tuple)) else 1
+        event["time"] = elapsed
+        self.event = None
+        if self.hook is not None:
+            self.hook(event)
+        return event
+
+    def record_stage(self, stage, start, hit):
+        """
+        :param stage: one of STAGES
+        :param start: time.perf_counter() when the stage started
+        :param hit: whether the stage found ops
+        """
+        elapsed = time.perf_counter() - start
+        stats = self.stages[stage]
+        stats["calls"] += 1
+        stats["hits"] += bool(hit)
+        stats["time"] += elapsed
+        if self.event is not None:
+            self.event["stages"][stage] = {"hit": bool(hit), "time": elapsed}
+
+    def record_nodes(self, stage, nodes):
+        self.nodes[stage] += nodes
+        if self.event is not None:
+            self.event["nodes"] += nodes
+
+    def record_group(self, n_unseens, cached=False, timeout=False):
+        self.group_sizes.append(n_unseens)
+        self.cache_hits += cached
+        self.timeouts += timeout
+        if self.event is not None:
+            self.event["group_sizes"].append(n_unseens)
+            self.event["timeouts"] += timeout
+
+    def record_estimate(self):
+        self.estimates += 1
+
+    def summary(self):
+        group_sizes = sorted(self.group_sizes)
+        return {
+            "moves": self.moves,
+            "time": self.time,
+            "stages": {stage: dict(stats) for stage, stats in self.stages.items()},
+            "nodes": dict(self.nodes),
+            "groups": {
+                "count": len(group_sizes),
+                "mean_unseens": sum(group_sizes) / len(group_sizes) if group_sizes else 0.,
+                "max_unseens": group_sizes[-1] if group_sizes else 0,
+                "cache_hits": self.cache_hits,
+                "timeouts": self.timeouts,
+                "estimates": self.estimates,
+            },
+        }
+
+    @staticmethod
+    def merge(summaries):
+        """
+        merge summaries of several engines, e.g., engines of games in a simulation
+        """
+        merged = Stats().summary()
+        total_unseens = 0.
+        for summary in summaries:
+            merged["moves"] += summary["moves"]
+            merged["time"] += summary["time"]
+            for stage, stats in summary["stages"].items():
+                for name, value in stats.items():
+                    merged["stages"][stage][name] += value
+            for stage, nodes in summary["nodes"].items():
+                merged["nodes"][stage] = merged["nodes"].get(stage, 0) + nodes
+            groups = summary["groups"]
+            total_unseens += groups["mean_unseens"] * groups["count"]
+            merged["groups"]["max_unseens"] = max(merged["groups"]["max_unseens"], groups["max_unseens"])
+            for name in ["count", "cache_hits", "timeouts", "estimates"]:
+                merged["groups"][name] += groups[name]
+        if merged["groups"]["count"]:
+            merged["groups"]["mean_unseens"] = total_unseens / merged["groups"]["count"]
+        return merged
+
+    @staticmethod
+    def format(summary):
+        lines = [f"moves: {summary['moves']}, time: {summary['time']:.2f}s"]
+        for stage, stats in summary["stages"].items():
+            if stats["calls"] == 0:
+                continue
+            lines.append(f"{stage:>8}: calls {stats['calls']}, hits {stats['hits']}, "
+                         f"time {stats['time']:.2f}s ({1000. * stats['time'] / stats['calls']:.2f}ms per call), "
+                         f"nodes {summary['nodes'].get(stage, 0)}")
+        groups = summary["groups"]
+        lines.append(f"level 3 groups: {groups['count']}, mean unseens {groups['mean_unseens']:.1f}, "
+                     f"max unseens {groups['max_unseens']}, cache hits {groups['cache_hits']}, "
+                     f"timeouts {groups['timeouts']}, estimates {groups['estimates']}")
+        return "\n".join(lines)
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
@@ -25,7 +25,7 @@ context = minesweeper.initialize(first_step)
 # s = context.front_side.draw_board(lambda x: {UNSEEN: "[ ]", FLAG: "P"}.get(x, x))
 # print(s)
 
-# context.load(path="checkpoints/2023-01-17-16-53-51.pkl")
+# context.load(path="checkpoints/2023-01-17-16-53-51.ckpt")
 context.load()
 s = context.front_side.draw_board(lambda x: {UNSEEN: "[ ]", FLAG: "P"}.get(x, x))
 # s = context.front_side.draw_board()
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/19 10:00
+# Author  : Yichen Lu
+
+import sys
+from pathlib import Path
+
+# modules of the repository are imported as top-level modules, e.g., `import utils`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/19 10:00
+# Author  : Yichen Lu
+
+import minesweeper
+from minesweeper import checkpoint, interact
+
+
+def test_game_log_with_many_ops(tmp_path):
+    context = minesweeper.initialize(interact.Operation(0, 0, "step"), 300, 300, 20000, seed=0)
+    context.is_draw = False
+    path = tmp_path / "game.log"
+    context.record(path)
+    ops = [interact.Operation(h, w, "flag") for h, w in sorted(context.front_side.unseens)]
+    # more ops in a move than uint16 can count
+    assert len(ops) > 65535
+    context.interact_batch(ops)
+    context.interact_batch(ops[:10])
+    context.stop_recording()
+
+    replayed = checkpoint.GameLog.replay(path)
+    assert list(replayed.front_side.codes) == list(context.front_side.codes)
+    assert replayed.front_side.flags == context.front_side.flags
+    assert len(checkpoint.GameLog.replay(path, moves=1).front_side.flags) == len(ops)
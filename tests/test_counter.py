@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/19 10:00
+# Author  : Yichen Lu
+
+import copy
+import math
+import random
+
+import minesweeper
+from solver import Engine
+from solver.engine import BitPseudoContext, solve_group_state
+from solver.sampler import SamplingEstimator
+from solver.counter import Counter, binomial_ratios
+
+
+def test_binomial_ratios():
+    for n, k, count in [(300, 80, 81), (9000, 2000, 200), (10, 20, 3), (5, 3, 6), (480, 99, 1)]:
+        ratios = binomial_ratios(n, k, count)
+        exact = [math.comb(n, k - t) if k >= t else 0 for t in range(count)]
+        # proportional to C(n, k - t) and no larger than them
+        assert all(ratio * max(exact) == max(ratios) * binomial for ratio, binomial in zip(ratios, exact))
+        assert all(ratio <= binomial for ratio, binomial in zip(ratios, exact))
+
+
+def shifted(counter, rows):
+    """
+    copy of counter whose unseens are moved down by rows, i.e., a disjoint group with the same solutions
+    """
+    counter = copy.deepcopy(counter)
+    for info_dict in counter.pseudo_contexts.values():
+        info_dict["flag_cnts"] = {(h + rows, w): cnt for (h, w), cnt in info_dict["flag_cnts"].items()}
+    return counter
+
+
+def test_conclude_sampled_counter_with_many_inland_unseens():
+    random.seed(7)
+    context = minesweeper.initialize(Engine.first_step())
+    context.is_draw = False
+    engine = Engine(context)
+    for _ in range(6):
+        context.interact(engine.what_next(mode="most"))
+    group = max(engine.group_incomplete_hints_into_disjoint_sets(), key=len)
+
+    estimator = SamplingEstimator(BitPseudoContext(group, context))
+    for _ in range(200):
+        estimator.sample()
+    sampled = estimator.counter()
+    exact = solve_group_state(BitPseudoContext(group, context).state())
+    # many disjoint groups, thus weights of inland unseens are given for hundreds of numbers of mines
+    counters = [shifted(exact, 100 * i) for i in range(1, 31)]
+    floats = copy.deepcopy(counters)
+    for counter in floats:
+        for info_dict in counter.pseudo_contexts.values():
+            info_dict["cnt"] = float(info_dict["cnt"])
+            info_dict["flag_cnts"] = {unseen: float(cnt) for unseen, cnt in info_dict["flag_cnts"].items()}
+
+    for n_inland, remains in [(2000, 400), (9000, 2000)]:
+        inland_unseens = [(-1, i) for i in range(n_inland)]
+        conclusion = Counter.conclude_with_disjoint_counters(counters + [sampled], inland_unseens, remains)
+        assert all(-1e-9 <= prob <= 1 + 1e-9 for prob in conclusion["probs"].values())
+
+        # float counts give the same probabilities as exact integers
+        expected = Counter.conclude_with_disjoint_counters(counters, inland_unseens, remains)["probs"]
+        probs = Counter.conclude_with_disjoint_counters(floats, inland_unseens, remains)["probs"]
+        assert all(math.isclose(probs[unseen], prob, abs_tol=1e-9) for unseen, prob in expected.items())
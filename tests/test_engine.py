@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Time    : 2026/10/19 10:00
+# Author  : Yichen Lu
+
+import sys
+import subprocess
+from pathlib import Path
+
+from solver import engine
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_close_pools():
+    pool = engine.get_pool(2)
+    workers = list(pool._pool)
+    assert pool.apply(sum, ([1, 2], )) == 3
+    engine.close_pools()
+    assert not engine.pools
+    assert not any(worker.is_alive() for worker in workers)
+
+
+def test_pools_closed_at_exit():
+    # exit functions run in reverse order of registration, thus the state registered before importing engine is
+    # printed after close_pools(), "CLOSE" for a pool closed and joined, "RUN" for one left to interpreter teardown
+    code = "\n".join([
+        "import atexit",
+        "pools = []",
+        "atexit.register(lambda: print([pool._state for pool in pools]))",
+        "from solver import engine",
+        "pools.append(engine.get_pool(2))",
+    ])
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "['CLOSE']"
@@ -2,16 +2,83 @@
 # Time    : 2022/12/31 17:53
 # Author  : Yichen Lu
 
+import random
 from typing import Dict, Union, List, Tuple
 from time import time
-from collections import defaultdict
+from functools import lru_cache
+from collections import defaultdict, OrderedDict
 from global_variables import *
 import unicodedata
 
 biases = [[-1, -1], [-1, 0], [-1, 1], [0, -1], [0, 1], [1, -1], [1, 0], [1, 1]]
 
 
-def iter_around(h, w, height=HEIGHT, width=WIDTH, around_type=None, context=None):
+class NeighborTable(object):
+    """
+    Table of neighbors computed on access, in place of the tables built for every point, for boards with more than
+    NEIGHBOR_TABLE_MAX_CELLS cells (see minesweeper/chunked.py). Neighbors of at most max_computed recently visited
+    points are kept.
+    """
+    __slots__ = ["height", "width", "as_indices", "computed"]
+    max_computed = 1 << 16
+
+    def __init__(self, height, width, as_indices=False):
+        self.height = height
+        self.width = width
+        self.as_indices = as_indices
+        self.computed = dict()
+
+    def __len__(self):
+        return self.height * self.width
+
+    def __getitem__(self, index):
+        neighbors = self.computed.get(index)
+        if neighbors is None:
+            h, w = divmod(index, self.width)
+            positions = [(h + bias_h, w + bias_w) for bias_h, bias_w in biases
+                         if 0 <= h + bias_h < self.height and 0 <= w + bias_w < self.width]
+            if self.as_indices:
+                neighbors = tuple(around_h * self.width + around_w for around_h, around_w in positions)
+            else:
+                neighbors = tuple(positions)
+            if len(self.computed) >= self.max_computed:
+                self.computed.clear()
+            self.computed[index] = neighbors
+        return neighbors
+
+
+@lru_cache(maxsize=None)
+def neighbor_positions(height, width):
+    """
+    positions around every point, built once per geometry
+    :param height: height of minesweeper
+    :param width: width of minesweeper
+    :return: positions around point (h, w) are at index h * width + w
+    """
+    if height * width > NEIGHBOR_TABLE_MAX_CELLS:
+        return NeighborTable(height, width)
+    return tuple(
+        tuple((h + bias_h, w + bias_w) for bias_h, bias_w in biases
+              if 0 <= h + bias_h < height and 0 <= w + bias_w < width)
+        for h in range(height) for w in range(width)
+    )
+
+
+@lru_cache(maxsize=None)
+def neighbor_indices(height, width):
+    """
+    flat indices (h * width + w) around every point, built once per geometry
+    :param height: height of minesweeper
+    :param width: width of minesweeper
+    :return: indices around point (h, w) are at index h * width + w
+    """
+    if height * width > NEIGHBOR_TABLE_MAX_CELLS:
+        return NeighborTable(height, width, as_indices=True)
+    return tuple(tuple(around_h * width + around_w for around_h, around_w in positions)
+                 for positions in neighbor_positions(height, width))
+
+
+def iter_around(h, w, height, width, around_type=None, context=None):
     """
     iter around single point
     :param h: h
@@ -22,16 +89,14 @@ def iter_around(h, w, height=HEIGHT, width=WIDTH, around_type=None, context=None
     :param context: interact.Context
     :return: positions around
     """
-    for bias_h, bias_w in biases:
-        around_h, around_w = h + bias_h, w + bias_w
-        if 0 <= around_h < height and 0 <= around_w < width:
-            if around_type is None or \
-                    context.front_side.type(around_h, around_w) == around_type or \
-                    context.back_side.type(around_h, around_w) == around_type:
-                yield around_h, around_w
+    for around_h, around_w in neighbor_positions(height, width)[h * width + w]:
+        if around_type is None or \
+                context.front_side.type(around_h, around_w) == around_type or \
+                context.back_side.type(around_h, around_w) == around_type:
+            yield around_h, around_w
 
 
-def iter_arounds(positions, height=HEIGHT, width=WIDTH, around_type=None, context=None, blocks=None):
+def iter_arounds(positions, height, width, around_type=None, context=None, blocks=None):
     """
     iter around a group of points
     :param positions: position of such group of points
@@ -44,11 +109,11 @@ def iter_arounds(positions, height=HEIGHT, width=WIDTH, around_type=None, contex
     """
     blocks = blocks if blocks else set()
 
+    table = neighbor_positions(height, width)
     visited = set(positions)
     for h, w in positions:
-        for bias_h, bias_w in biases:
-            around_h, around_w = h + bias_h, w + bias_w
-            if 0 <= around_h < height and 0 <= around_w < width and (around_h, around_w) not in visited:
+        for around_h, around_w in table[h * width + w]:
+            if (around_h, around_w) not in visited:
                 # check type of around points and whether is in blocks
                 if (around_type is None or context.front_side.type(around_h, around_w) == around_type) \
                         and (around_h, around_w) not in blocks:
@@ -80,7 +145,7 @@ def look_around(h, w, context, pseudo_context=None) -> Dict:
     #     raise RuntimeError
 
     around = defaultdict(list)
-    for around_h, around_w in iter_around(h, w):
+    for around_h, around_w in iter_around(h, w, context.height, context.width):
         element = context.front_side.get(around_h, around_w)
         if element == FLAG:
             around['flags'].append((around_h, around_w))
@@ -102,18 +167,141 @@ def look_around(h, w, context, pseudo_context=None) -> Dict:
     return around
 
 
+class Around(object):
+    """
+    Fixed buffers filled by look_around_into(), the same instance can be reused among calls to avoid allocation.
+    Only the first n_* items of each buffer are valid.
+    """
+    __slots__ = ["flags", "unseens", "hints", "pseudo_clears",
+                 "n_flags", "n_unseens", "n_hints", "n_pseudo_clears", "value", "remains"]
+
+    def __init__(self):
+        self.flags = [None] * 8
+        self.unseens = [None] * 8
+        self.hints = [None] * 8
+        self.pseudo_clears = [None] * 8
+        self.n_flags = self.n_unseens = self.n_hints = self.n_pseudo_clears = 0
+        self.value = None
+        self.remains = None
+
+
+def look_around_into(h, w, context, around: Around, pseudo_context=None) -> Around:
+    """
+    same as look_around(), but fill the given buffers instead of allocating a dict of lists
+    :return: around
+    """
+    front_side = context.front_side
+    codes, width = front_side.codes, front_side.width
+    index = h * width + w
+    n_flags = n_unseens = n_hints = n_pseudo_clears = 0
+    for around_index, position in zip(neighbor_indices(front_side.height, width)[index],
+                                      neighbor_positions(front_side.height, width)[index]):
+        code = codes[around_index]
+        if code == FLAG_CODE:
+            around.flags[n_flags] = position
+            n_flags += 1
+        elif code == UNSEEN_CODE:
+            if pseudo_context is None:
+                around.unseens[n_unseens] = position
+                n_unseens += 1
+            elif position in pseudo_context.pseudo_flags:
+                around.flags[n_flags] = position
+                n_flags += 1
+            elif position in pseudo_context.pseudo_hints:
+                around.hints[n_hints] = position
+                n_hints += 1
+            elif position in pseudo_context.pseudo_clears:
+                around.pseudo_clears[n_pseudo_clears] = position
+                n_pseudo_clears += 1
+            else:
+                around.unseens[n_unseens] = position
+                n_unseens += 1
+        elif code <= 8:
+            around.hints[n_hints] = position
+            n_hints += 1
+    around.n_flags, around.n_unseens, around.n_hints, around.n_pseudo_clears = \
+        n_flags, n_unseens, n_hints, n_pseudo_clears
+    code = codes[index]
+    around.value = front_side.get(h, w)
+    around.remains = code - n_flags if code <= 8 else None
+    return around
+
+
+def count_around(h, w, context, pseudo_context=None):
+    """
+    count tiles around without collecting their positions, pseudo flags and pseudo hints are counted as flags and
+    hints like look_around()
+    :return: (number of flags, number of unseens, number of hints)
+    """
+    front_side = context.front_side
+    codes, width = front_side.codes, front_side.width
+    index = h * width + w
+    n_flags = n_unseens = n_hints = 0
+    if pseudo_context is None:
+        for around_index in neighbor_indices(front_side.height, width)[index]:
+            code = codes[around_index]
+            if code == FLAG_CODE:
+                n_flags += 1
+            elif code == UNSEEN_CODE:
+                n_unseens += 1
+            elif code <= 8:
+                n_hints += 1
+        return n_flags, n_unseens, n_hints
+
+    for around_index, position in zip(neighbor_indices(front_side.height, width)[index],
+                                      neighbor_positions(front_side.height, width)[index]):
+        code = codes[around_index]
+        if code == FLAG_CODE:
+            n_flags += 1
+        elif code == UNSEEN_CODE:
+            if position in pseudo_context.pseudo_flags:
+                n_flags += 1
+            elif position in pseudo_context.pseudo_hints:
+                n_hints += 1
+            elif position not in pseudo_context.pseudo_clears:
+                n_unseens += 1
+        elif code <= 8:
+            n_hints += 1
+    return n_flags, n_unseens, n_hints
+
+
 def iter_incomplete_hints(context):
-    for hint_h, hint_w in context.front_side.hints:
-        around = look_around(hint_h, hint_w, context)
-        if around["unseens"]:
-            yield hint_h, hint_w
+    # kept up to date by FrontSide.update_frontier()
+    yield from context.front_side.incomplete_hints
 
 
 def iter_inland_unseens(context):
-    for unseen_h, unseen_w in context.front_side.unseens:
-        around = look_around(unseen_h, unseen_w, context)
-        if len(around["hints"]) == 0:
-            yield unseen_h, unseen_w
+    # kept up to date by FrontSide.update_frontier()
+    yield from context.front_side.inland_unseens
+
+
+def random_position(positions, rng=random):
+    """
+    random position of a set of positions, an implicit set (see minesweeper/chunked.py) samples by itself instead of
+    being listed
+    """
+    if hasattr(positions, "choice"):
+        return positions.choice(rng)
+    return rng.choice(list(positions))
+
+
+def popcount(x):
+    return bin(x).count("1")
+
+
+if hasattr(int, "bit_count"):
+    # python 3.10+
+    popcount = int.bit_count
+
+
+def iter_bits(x):
+    """
+    iter lowest set bits of x, e.g., 0b1010 -> 0b10, 0b1000
+    """
+    while x:
+        low = x & -x
+        yield low
+        x ^= low
 
 
 def create_timer_function(start, last):
@@ -146,3 +334,33 @@ class UnionFind(object):
         father_a, father_b = self.find(node_a), self.find(node_b)
         if father_a != father_b:
             self.father_dict[father_b] = father_a
+
+
+class LRUCache(object):
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key not in self.items:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+    def clear(self):
+        self.items.clear()
+
+    def __len__(self):
+        return len(self.items)